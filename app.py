@@ -1,66 +1,147 @@
 # app.py - Deewanshi Car Center Voice Assistant (Final Version)
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import os
-import whisper
-import pyttsx3
 import sqlite3
-from datetime import datetime, timedelta
-import dateparser
-import pygame
+from datetime import datetime
 import tempfile
-from gtts import gTTS
+import threading
+import time
+import io
+import json
+import hashlib
+import hmac
+import secrets
+from dialogue import SessionStore, DialogueEngine, SLOT_TAKEN
+from spoken_dates import parse_date, parse_time
+from vehicle_number import normalize_vehicle_no, is_plausible_plate
+from vehicle_index import VehicleIndex
+import metrics
+from metrics import span, timed
+from scheduler import scheduler_from_env
+from prompt_audio import PromptBundle, reply_segments
+from conversation_log import ConversationLog
+from bulk import (
+    ensure_schema, record_history, archive_completed, read_rows, import_bookings, export_bookings,
+)
 
 app = Flask(__name__)
 
 # ==================== CONFIG ====================
-DB_FILE = "appointments.db"
-
-# Load Whisper model
-print("Loading Whisper model (base for speed)...")
-model = whisper.load_model("base")
-print("Model loaded!")
+DB_FILE = os.environ.get("APPOINTMENTS_DB", "appointments.db")
+# Log the per-stage breakdown of any request slower than this (0 = off)
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+# Load tests: replace gTTS + playback with a fixed delay of this many ms (unset = real TTS)
+SIMULATED_TTS_MS = os.environ.get("SIMULATED_TTS_MS")
+# Pre-rendered prompt audio for the browser: where it lives and which TTS renders it
+PROMPT_AUDIO_DIR = os.environ.get("PROMPT_AUDIO_DIR", "prompt_audio")
+PROMPT_TTS = os.environ.get("PROMPT_TTS", "gtts")
+# Signs the /audio/say texts handed out with replies; set it when running more
+# than one worker, or a reply signed by one worker is refused by another
+AUDIO_SAY_SECRET = (os.environ.get("AUDIO_SAY_SECRET") or secrets.token_hex(16)).encode()
+# JSONL log of every dialogue turn, one file per process, rotated and gzipped past
+# the size limit. It records callers' names and vehicle numbers, so it is off
+# unless a path is set; CONVERSATION_LOG_BACKUPS bounds how much is retained.
+CONVERSATION_LOG = os.environ.get("CONVERSATION_LOG", "")
+CONVERSATION_LOG_MAX_MB = float(os.environ.get("CONVERSATION_LOG_MAX_MB", "10"))
+CONVERSATION_LOG_BACKUPS = int(os.environ.get("CONVERSATION_LOG_BACKUPS", "10"))
+# Bulk import/export need "Authorization: Bearer <ADMIN_TOKEN>"; unset = switched off
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
 
 # ==================== DATABASE ====================
 def init_db():
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS appointments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            vehicle_no TEXT NOT NULL UNIQUE,
-            date TEXT NOT NULL,
-            time TEXT NOT NULL
-        )
-    ''')
+    ensure_schema(c)
+    archived = archive_completed(c)
     conn.commit()
+    if archived:
+        print(f"Archived {archived} past appointments to history.")
     conn.close()
 
 init_db()
 
-# ==================== TTS - gTTS (Indian voice, no build errors) ====================
-import os
-import tempfile
-import pygame
-from gtts import gTTS
+# ==================== FUZZY VEHICLE INDEX ====================
+# Recognizer slips (O/0, B/8, a dropped character) still find the booking.
+def load_vehicle_index():
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT vehicle_no FROM appointments")
+    index = VehicleIndex(row[0] for row in c.fetchall())
+    conn.close()
+    return index
 
+vehicle_index = load_vehicle_index()
+
+# ==================== SCHEDULER ====================
+# Bays, job lengths and opening hours come from SERVICE_BAYS, SERVICE_DURATIONS,
+# BUSINESS_HOURS and CLOSED_WEEKDAYS (see scheduler.py); the defaults keep the
+# original 10:00 / 13:00 / 16:00 single-bay day.
+def load_schedule_day(day):
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT time, bay, service FROM appointments WHERE date=?", (day.isoformat(),))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+scheduler = scheduler_from_env(load_day=load_schedule_day)
+
+# Other gunicorn workers and `python bulk.py import` write the same file. SQLite
+# bumps data_version whenever another connection commits, so a change means the
+# cached days may be stale. book_appointment still re-reads the day it writes.
+_version_conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+_version_lock = threading.Lock()
+_version_seen = None
+
+def refresh_schedule():
+    global _version_seen
+    with _version_lock:
+        version = _version_conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != _version_seen:
+            scheduler.clear()
+            _version_seen = version
+
+def commit_own(conn):
+    """Commit a write this process has already applied to `scheduler`.
+
+    Our helpers use their own connections, so their commits bump data_version
+    too; only a bump that happened before ours means another process wrote.
+    """
+    global _version_seen
+    with _version_lock:
+        before = _version_conn.execute("PRAGMA data_version").fetchone()[0]
+        conn.commit()
+        if before == _version_seen:
+            _version_seen = _version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+# ==================== TTS - gTTS (Indian voice, no build errors) ====================
+# gTTS and pygame are imported on first use: together they are a large part of
+# cold start, and workers whose browser clients play audio never need them.
 def speak(text):
     print(f"Assistant: {text}")
+    if SIMULATED_TTS_MS is not None:
+        with span("tts_simulated"):
+            time.sleep(float(SIMULATED_TTS_MS) / 1000)
+        return
     try:
+        import pygame
+        from gtts import gTTS
+
         # Indian English voice
         tts = gTTS(text=text, lang='en', tld='co.in', slow=False)
         
         # Save to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
+        with span("tts_synthesis"), tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
             temp_path = fp.name
             tts.save(temp_path)
         
         # Play sound
-        pygame.mixer.init()
-        pygame.mixer.music.load(temp_path)
-        pygame.mixer.music.play()
-        while pygame.mixer.music.get_busy():
-            pygame.time.wait(100)
+        with span("tts_playback"):
+            pygame.mixer.init()
+            pygame.mixer.music.load(temp_path)
+            pygame.mixer.music.play()
+            while pygame.mixer.music.get_busy():
+                pygame.time.wait(100)
         
         # Cleanup
         pygame.mixer.quit()
@@ -69,74 +150,262 @@ def speak(text):
     except Exception as e:
         print(f"TTS failed: {e}")
 
-# ==================== VEHICLE NUMBER NORMALIZER ====================
-def normalize_vehicle_no(text):
-    """Convert any spoken vehicle number to clean format: PB123456"""
-    cleaned = text.upper()
-    cleaned = cleaned.replace(" ", "").replace("-", "").replace(".", "")
-    # Remove common spoken words
-    fillers = ["ZERO", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "TEN", "OH"]
-    for f in fillers:
-        cleaned = cleaned.replace(f, "")
-    # Keep only letters and numbers
-    cleaned = ''.join(c for c in cleaned if c.isalnum())
-    return cleaned
-
-# ==================== SESSION STATE ====================
-class Session:
-    def __init__(self):
-        self.reset()
-    def reset(self):
-        self.stage = "welcome"
-        self.user_name = None
-        self.vehicle_no = None
-        self.pref_date = None
-
-session = Session()
+# ==================== PROMPT AUDIO BUNDLE ====================
+# Built (or reloaded from PROMPT_AUDIO_DIR) in the background so startup isn't
+# held up by TTS; until it is ready clients fall back to server-side speech.
+prompt_bundle = PromptBundle(PROMPT_AUDIO_DIR, PROMPT_TTS)
+threading.Thread(target=prompt_bundle.ensure, name="prompt-audio", daemon=True).start()
 
 # ==================== DB HELPERS ====================
-def find_next_slot(date_str):
-    base = dateparser.parse(date_str, settings={'PREFER_DATES_FROM': 'future'}) or datetime.now()
-    check_date = base.date()
-    slots = ["10:00", "13:00", "16:00"]
-
-    for _ in range(30):
-        d_str = check_date.strftime("%Y-%m-%d")
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT time FROM appointments WHERE date=?", (d_str,))
-        booked = [r[0] for r in c.fetchall()]
+def bookable(service):
+    """`service`, or the general one for a booking whose bay has since been
+    taken out of SERVICE_BAYS (scheduler_from_env checks "service" has a bay)."""
+    return service if service in scheduler.by_service else "service"
+
+def find_next_slot(date_str, time_str=None, service="service"):
+    """Earliest day on or after the requested one with room, as close to the
+    requested time as that day allows."""
+    refresh_schedule()
+    now = datetime.now()
+    check_date = max(parse_date(date_str) or now.date(), now.date())
+    pref_time = parse_time(time_str) if time_str else None
+    service = bookable(service)
+    placement = scheduler.find(check_date, service, pref_time, now=now)
+    if placement is None:
+        raise ValueError(f"No bay is configured for {service!r}")
+    return placement.date.isoformat(), placement.time
+
+def book_appointment(name, vehicle, date, time, service="service"):
+    day = datetime.strptime(date, "%Y-%m-%d").date()
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    c = conn.cursor()
+    insert = "INSERT INTO appointments (username, vehicle_no, date, time, bay, service) VALUES (?, ?, ?, ?, ?, ?)"
+    try:
+        # With the write lock held, re-read the day: another worker or an
+        # import may have taken the slot since it was cached
+        c.execute("BEGIN IMMEDIATE")
+        scheduler.forget(day)
+        bay = scheduler.bay_at(day, time, service)
+        if bay is None:
+            return SLOT_TAKEN
+        row = (name.title(), vehicle, date, time, bay, service)
+        try:
+            c.execute(insert, row)
+        except sqlite3.IntegrityError:
+            # The vehicle's earlier booking may just be a finished service
+            if not archive_completed(c, vehicle=vehicle):
+                return False
+            c.execute(insert, row)
+        commit_own(conn)
+    finally:
         conn.close()
+    scheduler.occupy(day, time, bay, service)
+    vehicle_index.add(vehicle)
+    return True
 
-        for slot in slots:
-            if slot not in booked:
-                return d_str, slot
-        check_date += timedelta(days=1)
+def _current_booking(c, vehicle):
+    c.execute("SELECT date, time, bay, service FROM appointments WHERE vehicle_no=?", (vehicle,))
+    return c.fetchone()
 
-    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-    return tomorrow, "10:00"
-
-def book_appointment(name, vehicle, date, time):
+def cancel_appointment(vehicle):
+    """Delete the booking (freeing its slot) and keep a copy in history."""
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
     try:
-        c.execute("INSERT INTO appointments (username, vehicle_no, date, time) VALUES (?, ?, ?, ?)",
-                  (name.title(), vehicle, date, time))
-        conn.commit()
+        booking = _current_booking(c, vehicle)
+        if booking is None:
+            return False
+        record_history(c, "vehicle_no = ?", (vehicle,), "cancelled")
+        c.execute("DELETE FROM appointments WHERE vehicle_no=?", (vehicle,))
+        commit_own(conn)
+    finally:
+        conn.close()
+    old_date, old_time, bay, service = booking
+    scheduler.release(datetime.strptime(old_date, "%Y-%m-%d").date(), old_time, bay, service)
+    vehicle_index.remove(vehicle)
+    return True
+
+def reschedule_appointment(vehicle, date, time):
+    """Move the booking to a new slot in place; the old slot goes to history."""
+    conn = sqlite3.connect(DB_FILE, timeout=30)
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        booking = _current_booking(c, vehicle)
+        if booking is None:
+            return False
+        old_date, old_time, old_bay, service = booking
+        old_day = datetime.strptime(old_date, "%Y-%m-%d").date()
+        new_day = datetime.strptime(date, "%Y-%m-%d").date()
+        # Both days as they are now, then free the old slot so the job can
+        # move within its own window
+        scheduler.forget(old_day)
+        scheduler.forget(new_day)
+        scheduler.release(old_day, old_time, old_bay, service)
+        new_service = bookable(service)
+        bay = scheduler.bay_at(new_day, time, new_service)
+        if bay is None:
+            scheduler.occupy(old_day, old_time, old_bay, service)
+            return False
+        record_history(c, "vehicle_no = ?", (vehicle,), "rescheduled")
+        c.execute("UPDATE appointments SET date=?, time=?, bay=?, service=? WHERE vehicle_no=?",
+                  (date, time, bay, new_service, vehicle))
+        commit_own(conn)
+        scheduler.occupy(new_day, time, bay, new_service)
         return True
-    except sqlite3.IntegrityError:
-        return False
     finally:
         conn.close()
 
 def get_appointment(vehicle):
+    """Booking for `vehicle`, or for the one indexed plate it is a near miss of.
+
+    The row carries the plate that matched, so the dialogue can tell a fuzzy
+    hit from an exact one and confirm it before reading anything out.
+    """
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute("SELECT username, date, time FROM appointments WHERE vehicle_no=?", (vehicle,))
+    query = "SELECT username, date, time, vehicle_no, service FROM appointments WHERE vehicle_no=?"
+    c.execute(query, (vehicle,))
     result = c.fetchone()
+    if result is None:
+        match = vehicle_index.best(vehicle)
+        if match is not None:
+            c.execute(query, (match,))
+            result = c.fetchone()
+            if result is None:
+                # Cancelled or archived by another process since it was indexed
+                vehicle_index.remove(match)
     conn.close()
     return result
 
+# ==================== DIALOGUE ====================
+# Callers that don't send a session_id share the "default" conversation
+sessions = SessionStore()
+# Voice bookings and bulk imports both allocate slots; one at a time per process
+booking_lock = threading.Lock()
+engine = DialogueEngine(
+    find_slot=timed("find_slot", find_next_slot),
+    book=timed("db_book", book_appointment),
+    lookup=timed("db_lookup", get_appointment),
+    cancel=timed("db_cancel", cancel_appointment),
+    reschedule=timed("db_reschedule", reschedule_appointment),
+    normalize_vehicle=normalize_vehicle_no,
+    validate_vehicle=is_plausible_plate,
+    span=span,
+    booking_lock=booking_lock,
+)
+# Written by a background thread; run_turn only queues entries
+conversation_log = ConversationLog(
+    CONVERSATION_LOG,
+    max_bytes=int(CONVERSATION_LOG_MAX_MB * 1024 * 1024),
+    backups=CONVERSATION_LOG_BACKUPS,
+) if CONVERSATION_LOG else None
+
+def run_turn(session_id, message=None):
+    """Advance one conversation; no message (re)starts it. Shared with asgi.py."""
+    session = sessions.get(session_id)
+    trace = metrics.current_trace()
+    stage = "start" if message is None else session.stage
+    if message is None:
+        turn = engine.start(session)
+    else:
+        if trace is not None:
+            trace.dialogue_stage = session.stage
+        with span("dialogue"):
+            turn = engine.step(session, message)
+        if turn.done:
+            sessions.discard(session_id)
+    if conversation_log is not None:
+        entry = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "session_id": session_id,
+            "stage": stage,
+            "input": message,
+            "next_stage": "done" if turn.done else session.stage,
+            "replies": list(turn.replies),
+            "prompts": [getattr(r, "key", None) for r in turn.replies],
+            "done": turn.done,
+        }
+        if trace is None:
+            conversation_log.record(entry)
+        else:
+            # Written once the request finishes, so the timings include TTS
+            trace.turn = entry
+    return turn
+
+def log_turn(trace):
+    """Queue the trace's dialogue turn, if it had one, with its stage timings."""
+    if trace.turn is None or conversation_log is None:
+        return
+    entry = trace.turn
+    entry["timings_ms"] = {stage: round(s * 1000, 3) for stage, s in trace.breakdown().items()}
+    entry["total_ms"] = round(trace.elapsed() * 1000, 3)
+    conversation_log.record(entry)
+
+def turn_payload(turn, session_id, client_audio=False):
+    payload = {
+        "reply": " ".join(turn.replies),
+        "replies": turn.replies,
+        "enable_mic": True,
+        "done": turn.done,
+        "session_id": session_id
+    }
+    if client_audio:
+        # Clips come from the prompt bundle, "say" parts from /audio/say
+        audio = [reply_segments(line) for line in turn.replies]
+        for segments in audio:
+            for segment in segments:
+                if "say" in segment:
+                    segment["sig"] = say_signature(segment["say"])
+        payload["audio"] = audio
+    return payload
+
+def say_signature(text):
+    """/audio/say only synthesizes text the server itself put in a reply."""
+    return hmac.new(AUDIO_SAY_SECRET, text.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+def wants_client_audio(data):
+    """The browser plays the reply itself when it asked to and has the bundle."""
+    return bool(data.get("client_audio")) and prompt_bundle.ready
+
+def list_appointments():
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("SELECT id, username, vehicle_no, date, time, bay, service FROM appointments "
+              "ORDER BY date ASC, time ASC")
+    rows = c.fetchall()
+    conn.close()
+
+    appointments = []
+    for row in rows:
+        appointments.append({
+            "id": row[0],
+            "username": row[1],
+            "vehicle_no": row[2],
+            "date": row[3],
+            "time": row[4],
+            "bay": row[5],
+            "service": row[6]
+        })
+    return appointments
+
+# ==================== LATENCY METRICS ====================
+@app.before_request
+def begin_request_trace():
+    metrics.begin_trace(request.url_rule.rule if request.url_rule else "unmatched")
+
+@app.after_request
+def record_request_trace(response):
+    trace = metrics.end_trace()
+    if trace is not None:
+        metrics.finish_request(trace, SLOW_REQUEST_MS)
+        log_turn(trace)
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
 # ==================== ROUTES ====================
 @app.route('/')
 def index():
@@ -144,174 +413,139 @@ def index():
 
 @app.route('/start', methods=['POST'])
 def start():
-    session.reset()
-    reply = "Good morning! Welcome to Deewanshi Car Center. May I know your name please?"
-    speak(reply)
-    session.stage = "ask_name"
-    return jsonify({"reply": reply, "enable_mic": True})
+    data = request.get_json(silent=True) or {}
+    session_id = data.get("session_id") or "default"
+    turn = run_turn(session_id)
+    client_audio = wants_client_audio(data)
+    if not client_audio:
+        for line in turn.replies:
+            speak(line)
+    return jsonify(turn_payload(turn, session_id, client_audio))
+
 @app.route('/listen', methods=['POST'])
 def listen():
-    user_input = request.json.get("message", "").strip().lower()
-    reply = ""
-    enable_mic = True
-    done = False
-
-    # Helper to speak + log
-    def say(text):
-        print(f"Assistant: {text}")
-        speak(text)
-        return text
-
-    # ====================== CONFIRMATION STATES ======================
-    if session.stage == "ask_name":
-        session.user_name = user_input.title()
-        reply = f"You said: {session.user_name}. Is this correct? Say yes or no."
-        session.stage = "confirm_name"
-        say(reply)
-
-    elif session.stage == "confirm_name":
-        if "yes" in user_input or "correct" in user_input:
-            reply = "Okay, confirmed!"
-            say(reply)
-            reply = f"Thank you {session.user_name.split()[0]}! How can I help you today? Say 'book appointment' or 'car status'."
-            session.stage = "main_menu"
-        else:
-            reply = "Sorry, please say your name again."
-            session.stage = "ask_name"
-        say(reply)
-
-    elif session.stage == "main_menu":
-        if any(x in user_input for x in ["book", "appointment", "service"]):
-            reply = "Please tell me your vehicle number."
-            session.stage = "get_vehicle"
-        elif any(x in user_input for x in ["status", "check", "ready"]):
-            reply = "Please say your vehicle number to check status."
-            session.stage = "check_status"
-        else:
-            reply = "Please say 'book appointment' or 'car status'."
-        say(reply)
-
-    elif session.stage == "get_vehicle":
-        session.vehicle_no = normalize_vehicle_no(user_input)
-        if len(session.vehicle_no) < 6:
-            reply = "That doesn't sound right. Please say your vehicle number again."
-            session.stage = "get_vehicle"
-        else:
-            reply = f"You said: {session.vehicle_no}. Is this correct? Say yes or no."
-            session.stage = "confirm_vehicle"
-        say(reply)
-
-    elif session.stage == "confirm_vehicle":
-        if "yes" in user_input or "correct" in user_input:
-            reply = "Okay, confirmed!"
-            say(reply)
-            reply = "What date would you like? For example, tomorrow, 20 November, or next week."
-            session.stage = "get_date"
-        else:
-            reply = "Please say your vehicle number again."
-            session.stage = "get_vehicle"
-        say(reply)
-
-    elif session.stage == "get_date":
-        session.pref_date = user_input
-        reply = f"You said: {user_input.title()}. Is this correct? Say yes or no."
-        session.stage = "confirm_date"
-        say(reply)
-
-    elif session.stage == "confirm_date":
-        if "yes" in user_input or "correct" in user_input:
-            reply = "Okay, confirmed!"
-            say(reply)
-            reply = "What time would you prefer? Like 10 AM, 2 PM, or 4 PM?"
-            session.stage = "get_time"
-        else:
-            reply = "Please say the date again."
-            session.stage = "get_date"
-        say(reply)
-
-    elif session.stage == "get_time":
-        session.pref_time = user_input
-        reply = f"You said: {user_input.title()}. Is this correct? Say yes or no."
-        session.stage = "confirm_time"
-        say(reply)
-
-    elif session.stage == "confirm_time":
-        if "yes" in user_input or "correct" in user_input:
-            reply = "Okay, confirmed!"
-            say(reply)
-            date_slot, time_slot = find_next_slot(session.pref_date)
-            success = book_appointment(session.user_name, session.vehicle_no, date_slot, time_slot)
-            nice_date = datetime.strptime(date_slot, "%Y-%m-%d").strftime("%d %B %Y")
-
-            if success:
-                reply = f"Excellent! Your appointment is booked for {nice_date} at {time_slot}."
-                say(reply)
-                reply = f"We will take good care of your car {session.vehicle_no}. Thank you!"
-            else:
-                reply = f"Sorry, {session.vehicle_no} already has an appointment."
-            say(reply)
-            reply = "Do you need any other help?"
-            session.stage = "final_ask"
-        else:
-            reply = "Please say the time again."
-            session.stage = "get_time"
-        say(reply)
-
-    elif session.stage == "final_ask":
-        if "no" in user_input or "thank" in user_input:
-            reply = f"Thank you {session.user_name.split()[0]}! Have a wonderful day!"
-            say(reply)
-            session.reset()
-            done = True
-        else:
-            reply = "How else may I assist you?"
-            session.stage = "main_menu"
-        say(reply)
-
-    # ====================== STATUS CHECK ======================
-    elif session.stage == "check_status":
-        vehicle = normalize_vehicle_no(user_input)
-        appt = get_appointment(vehicle)
-        if appt:
-            name, date, time = appt
-            nice_date = datetime.strptime(date, "%Y-%m-%d").strftime("%d %B %Y")
-            reply = f"Hello {name.split()[0]}! Your car {vehicle} will be ready on {nice_date} at {time}."
-        else:
-            reply = "No appointment found for this vehicle number."
-        say(reply)
-        session.reset()
-        done = True
-
-    return jsonify({
-        "reply": reply,
-        "enable_mic": enable_mic,
-        "done": done
-    })# ==================== ADMIN DATABASE ROUTE (Password protected in frontend) ====================
+    data = request.get_json(silent=True) or {}
+    session_id = data.get("session_id") or "default"
+    turn = run_turn(session_id, data.get("message", ""))
+    client_audio = wants_client_audio(data)
+    if not client_audio:
+        for line in turn.replies:
+            speak(line)
+    return jsonify(turn_payload(turn, session_id, client_audio))
+
+# ==================== PROMPT AUDIO ROUTES ====================
+BUNDLE_CACHE = "public, max-age=31536000, immutable"
+SAY_CACHE = "public, max-age=86400"
+
+def audio_response(body, mimetype, etag, cache_control):
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+@app.route('/audio/manifest.json')
+def audio_manifest():
+    if not prompt_bundle.ready:
+        return jsonify({"error": "prompt audio is still being prepared"}), 503
+    # Small and revalidated each visit; the bundle it names is cached for a year
+    return audio_response(json.dumps(prompt_bundle.manifest), "application/json",
+                          prompt_bundle.etag, "no-cache")
+
+@app.route('/audio/<name>.bin')
+def audio_bundle(name):
+    if not prompt_bundle.ready or f"{name}.bin" != prompt_bundle.bundle_name():
+        return jsonify({"error": "unknown bundle"}), 404
+    return audio_response(prompt_bundle.data, "application/octet-stream",
+                          prompt_bundle.etag, BUNDLE_CACHE)
+
+@app.route('/audio/say')
+def audio_say():
+    text = request.args.get("text", "")
+    if not text or len(text) > 200:
+        return jsonify({"error": "text must be 1-200 characters"}), 400
+    if not hmac.compare_digest(request.args.get("sig", "").encode(), say_signature(text).encode()):
+        return jsonify({"error": "unknown text"}), 403
+    etag = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    if request.if_none_match.contains(etag):
+        return audio_response(b"", prompt_bundle.mimetype, etag, SAY_CACHE)
+    try:
+        with span("tts_dynamic"):
+            audio = prompt_bundle.say(text)
+    except Exception as e:
+        print(f"TTS failed: {e}")
+        return jsonify({"error": "speech synthesis failed"}), 502
+    return audio_response(audio, prompt_bundle.mimetype, etag, SAY_CACHE)
+
+# ==================== ADMIN DATABASE ROUTE (Password protected in frontend) ====================
 @app.route('/admin/database')
 def admin_database():
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id, username, vehicle_no, date, time FROM appointments ORDER BY date ASC, time ASC")
-        rows = c.fetchall()
-        conn.close()
-
-        appointments = []
-        for row in rows:
-            appointments.append({
-                "id": row[0],
-                "username": row[1],
-                "vehicle_no": row[2],
-                "date": row[3],
-                "time": row[4]
-            })
-        
-        return jsonify(appointments)
-    
+        return jsonify(list_appointments())
     except Exception as e:
         print(f"Admin database error: {e}")
         return jsonify([]), 500
 
+# ==================== BULK IMPORT / EXPORT ====================
+def import_stream(stream, fmt="csv"):
+    """Import CSV/NDJSON bookings from a binary stream; shared with asgi.py."""
+    lines = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    with booking_lock:
+        conn = sqlite3.connect(DB_FILE, timeout=30)
+        try:
+            return import_bookings(conn, read_rows(lines, fmt), on_booked=vehicle_index.add,
+                                   on_archived=vehicle_index.remove,
+                                   scheduler=scheduler)
+        finally:
+            conn.close()
+
+def export_stream(fmt="csv"):
+    # asgi.py pulls each chunk on whichever pool thread is free
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    try:
+        yield from export_bookings(conn, fmt)
+    finally:
+        conn.close()
+
+def admin_authorized():
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+def bulk_format():
+    fmt = request.args.get("format")
+    if fmt in ("csv", "ndjson"):
+        return fmt
+    return "ndjson" if "ndjson" in (request.mimetype or "") else "csv"
+
+@app.route('/admin/import', methods=['POST'])
+def admin_import():
+    if not admin_authorized():
+        return jsonify({"error": "admin token required"}), 401
+    try:
+        report = import_stream(request.stream, bulk_format())
+    except (ValueError, KeyError) as e:
+        print(f"Bulk import error: {e}")
+        return jsonify({"error": str(e)}), 400
+    except sqlite3.Error as e:
+        print(f"Bulk import database error: {e}")
+        return jsonify({"error": "database busy or unavailable, nothing was imported"}), 503
+    print(f"Bulk import: {report['booked']}/{report['rows']} booked, "
+          f"{report['conflict_count']} conflicts, {report['rows_per_second']} rows/s")
+    return jsonify(report)
+
+@app.route('/admin/export')
+def admin_export():
+    if not admin_authorized():
+        return jsonify({"error": "admin token required"}), 401
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    mimetype = "application/x-ndjson" if fmt == "ndjson" else "text/csv"
+    return Response(stream_with_context(export_stream(fmt)), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=appointments.{fmt}"})
+
 # ==================== RUN ====================
 if __name__ == '__main__':
     print("\n" + "="*60)
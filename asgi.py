@@ -0,0 +1,155 @@
+# asgi.py - Async (ASGI) serving mode for the assistant routes
+# Run with:  uvicorn asgi:app --port 5000
+#
+# Only the conversation routes (/start, /listen) are handled here: their
+# dialogue turns (which hit SQLite) run on a thread pool so the event loop
+# never blocks, and replies are spoken by a single background TTS thread
+# after the response has been sent, so one process can hold hundreds of open
+# conversations. Every other route is app.py's Flask app, mounted through
+# a2wsgi on its own thread pool, so routes are written once.
+import asyncio
+import json
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+
+import app as sync_app
+import metrics
+
+# ==================== CONFIG ====================
+# Threads for dialogue turns / SQLite work
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", "32"))
+# Threads for the mounted Flask routes (admin, audio, static files, metrics)
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "8"))
+# "background": speak replies on the TTS thread without waiting; "off": skip TTS
+ASGI_TTS = os.environ.get("ASGI_TTS", "background")
+# Replies waiting to be spoken; past this they are dropped (the text still goes out)
+ASGI_TTS_QUEUE = int(os.environ.get("ASGI_TTS_QUEUE", "16"))
+
+flask_app = WSGIMiddleware(sync_app.app, workers=ASGI_WSGI_THREADS)
+
+# ==================== HELPERS ====================
+async def read_json(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    try:
+        data = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, obj, status=200):
+    body = json.dumps(obj).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+# ==================== BACKGROUND TTS ====================
+# One thread keeps the server's audio output in order. Each reply is spoken
+# whole or not at all, and audio that would start minutes late is dropped.
+tts_queue = queue.Queue(maxsize=ASGI_TTS_QUEUE)
+tts_dropped = 0
+
+
+def tts_worker():
+    while True:
+        replies = tts_queue.get()
+        if replies is None:
+            return
+        for line in replies:
+            sync_app.speak(line)
+
+
+def speak_later(replies):
+    global tts_dropped
+    if ASGI_TTS == "off" or not replies:
+        return
+    try:
+        tts_queue.put_nowait(list(replies))
+    except queue.Full:
+        tts_dropped += 1
+
+
+threading.Thread(target=tts_worker, name="tts", daemon=True).start()
+
+# ==================== CONVERSATION ROUTES ====================
+async def start(scope, receive, send):
+    data = await read_json(receive)
+    session_id = data.get("session_id") or "default"
+    turn = await asyncio.to_thread(sync_app.run_turn, session_id)
+    await reply(send, data, turn, session_id)
+
+
+async def listen(scope, receive, send):
+    data = await read_json(receive)
+    session_id = data.get("session_id") or "default"
+    turn = await asyncio.to_thread(sync_app.run_turn, session_id, data.get("message", ""))
+    await reply(send, data, turn, session_id)
+
+
+async def reply(send, data, turn, session_id):
+    client_audio = sync_app.wants_client_audio(data)
+    if not client_audio:
+        speak_later(turn.replies)
+    await send_json(send, sync_app.turn_payload(turn, session_id, client_audio))
+
+
+ROUTES = {
+    ("POST", "/start"): start,
+    ("POST", "/listen"): listen,
+}
+
+# ==================== ASGI ENTRY POINT ====================
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=ASGI_THREADS))
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            try:
+                tts_queue.put_nowait(None)
+            except queue.Full:
+                pass
+            if tts_dropped:
+                print(f"Background TTS: {tts_dropped} replies dropped (queue full)")
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    handler = ROUTES.get((scope["method"], path))
+    if handler is None:
+        # Flask's own before/after_request hooks record its metrics
+        await flask_app(scope, receive, send)
+        return
+
+    trace = metrics.begin_trace(path)
+    try:
+        await handler(scope, receive, send)
+    except Exception:
+        traceback.print_exc()
+        await send_json(send, {"error": "internal server error"}, status=500)
+    finally:
+        metrics.end_trace()
+        metrics.finish_request(trace, sync_app.SLOW_REQUEST_MS)
+        sync_app.log_turn(trace)
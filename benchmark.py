@@ -0,0 +1,501 @@
+# benchmark.py - Offline benchmarks for the car center assistant
+# Usage: python benchmark.py {dialogue,dates,vehicles,lookup,bulk,schedule,startup} [-n N]
+import argparse
+import io
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from dialogue import Session, DialogueEngine
+from vehicle_index import VehicleIndex, CONFUSABLE
+import spoken_dates
+import bulk
+from scheduler import Scheduler, Bay
+from vehicle_number import (
+    normalize_vehicle_no, is_plausible_plate, is_valid_plate,
+    DIGIT_WORDS, NATO_WORDS, LETTER_NAMES,
+)
+
+# ==================== IN-MEMORY BACKEND ====================
+class MemoryBookings:
+    """Dict-backed stand-in for the SQLite helpers in app.py."""
+
+    SLOTS = ["10:00", "13:00", "16:00"]
+
+    def __init__(self):
+        self.by_vehicle = {}
+        self.by_date = {}
+        # first day that may still have a free slot; keeps the stub O(1)
+        self.first_open = date.today() + timedelta(days=1)
+
+    def find_slot(self, pref_date, pref_time=None, service="service"):
+        while True:
+            d_str = self.first_open.strftime("%Y-%m-%d")
+            booked = self.by_date.setdefault(d_str, set())
+            for slot in self.SLOTS:
+                if slot not in booked:
+                    return d_str, slot
+            self.first_open += timedelta(days=1)
+
+    def book(self, name, vehicle, d_str, t_str):
+        if vehicle in self.by_vehicle:
+            return False
+        self.by_vehicle[vehicle] = (name, d_str, t_str, vehicle, "service")
+        self.by_date.setdefault(d_str, set()).add(t_str)
+        return True
+
+    def lookup(self, vehicle):
+        return self.by_vehicle.get(vehicle)
+
+    def cancel(self, vehicle):
+        appt = self.by_vehicle.pop(vehicle, None)
+        if appt is None:
+            return False
+        self.by_date[appt[1]].discard(appt[2])
+        self.first_open = min(self.first_open, date.fromisoformat(appt[1]))
+        return True
+
+    def reschedule(self, vehicle, d_str, t_str):
+        name = self.by_vehicle[vehicle][0]
+        self.cancel(vehicle)
+        return self.book(name, vehicle, d_str, t_str)
+
+
+def make_engine(backend):
+    return DialogueEngine(
+        find_slot=backend.find_slot,
+        book=backend.book,
+        lookup=backend.lookup,
+        cancel=backend.cancel,
+        reschedule=backend.reschedule,
+        normalize_vehicle=normalize_vehicle_no,
+        validate_vehicle=is_plausible_plate,
+    )
+
+# ==================== SCRIPTED CONVERSATIONS ====================
+NAMES = ["deewanshi sharma", "rahul verma", "anita", "karan singh", "priya nair"]
+DATES = ["tomorrow", "20 november", "next week", "monday", "5 december"]
+TIMES = ["10 am", "4 pm", "2 pm", "morning"]
+
+
+def booking_script(rng, vehicle):
+    script = [rng.choice(NAMES), "yes", "i want to book an appointment", vehicle]
+    if rng.random() < 0.2:
+        script += ["no", vehicle]
+    script += ["yes correct", rng.choice(DATES), "yes", rng.choice(TIMES), "yes"]
+    script.append(rng.choice(["no thank you", "no", "thanks bye",
+                              "no thank you, the service was great",
+                              "no, I don't need any service, thanks"]))
+    return script
+
+
+def status_script(rng, vehicle):
+    # "yes" answers "did you mean ...?" if the plate was only a near match
+    return [rng.choice(NAMES), "yes", "check my car status", vehicle, "yes"]
+
+
+def reschedule_script(rng, vehicle):
+    return [rng.choice(NAMES), "yes", "i want to reschedule", vehicle,
+            rng.choice(DATES), "yes", rng.choice(TIMES), "yes", "no"]
+
+
+def cancel_script(rng, vehicle):
+    return [rng.choice(NAMES), "yes", "cancel my appointment", vehicle, "yes", "no"]
+
+
+def make_scripts(n, seed=7):
+    rng = random.Random(seed)
+    scripts = []
+    for i in range(n):
+        vehicle = f"pb {10 + i % 90} ab {1000 + i}"
+        previous = f"pb {10 + (i - 1) % 90} ab {1000 + i - 1}"
+        if i % 12 == 5:
+            scripts.append(reschedule_script(rng, previous))
+        elif i % 12 == 11:
+            scripts.append(cancel_script(rng, previous))
+        elif i % 3 == 2:
+            scripts.append(status_script(rng, previous))
+        else:
+            scripts.append(booking_script(rng, vehicle))
+    return scripts
+
+
+def replay(engine, script):
+    session = Session()
+    turn = engine.start(session)
+    turns = 1
+    for text in script:
+        turn = engine.step(session, text)
+        turns += 1
+        if turn.done:
+            break
+    return turns, turn.done
+
+# ==================== BENCHMARKS ====================
+def bench_dialogue(args):
+    scripts = make_scripts(args.n)
+    backend = MemoryBookings()
+    engine = make_engine(backend)
+    t0 = time.perf_counter()
+    turns = finished = 0
+    for script in scripts:
+        t, done = replay(engine, script)
+        turns += t
+        finished += done
+    elapsed = time.perf_counter() - t0
+    print(f"dialogue: {len(scripts)} conversations, {turns} turns in {elapsed:.3f}s")
+    print(f"  {len(scripts) / elapsed:,.0f} conversations/s, {turns / elapsed:,.0f} turns/s, "
+          f"{elapsed / turns * 1e6:.1f} us/turn")
+    print(f"  completed: {finished}/{len(scripts)}, bookings: {len(backend.by_vehicle)}")
+
+
+DATE_SAMPLES = ["tomorrow", "20 november", "next week", "next monday", "friday",
+                "day after tomorrow", "5th of december", "in 3 days", "today"]
+TIME_SAMPLES = ["10 am", "4 pm", "2 p.m.", "11 30", "ten am", "16:00", "noon"]
+
+
+def _per_call(fn, samples, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(samples[i % len(samples)])
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def bench_dates(args):
+    today = date.today()
+    fast_date = spoken_dates._parse_date_cached.__wrapped__
+    fast_time = spoken_dates._parse_time_cached.__wrapped__
+    print(f"dates: {args.n} calls per case")
+    print(f"  fast date (uncached)     {_per_call(lambda s: fast_date(s, today), DATE_SAMPLES, args.n):8.2f} us/call")
+    print(f"  fast date (memoized)     {_per_call(spoken_dates.parse_date, DATE_SAMPLES, args.n):8.2f} us/call")
+    print(f"  fast time (uncached)     {_per_call(fast_time, TIME_SAMPLES, args.n):8.2f} us/call")
+    print(f"  fast time (memoized)     {_per_call(spoken_dates.parse_time, TIME_SAMPLES, args.n):8.2f} us/call")
+    try:
+        import dateparser
+    except ImportError:
+        print("  dateparser not installed; skipping the baseline")
+        return
+    settings = {"PREFER_DATES_FROM": "future"}
+    n = max(1, args.n // 100)
+    print(f"  dateparser.parse (all)   {_per_call(lambda s: dateparser.parse(s, settings=settings), DATE_SAMPLES, n):8.2f} us/call")
+    print(f"  dateparser.parse (en)    {_per_call(lambda s: dateparser.parse(s, languages=['en'], settings=settings), DATE_SAMPLES, n):8.2f} us/call")
+
+
+# ==================== SPOKEN PLATE CORPUS ====================
+STATES = ["PB", "DL", "HR", "MH", "KA", "UP", "RJ", "TN", "GJ", "CH"]
+SPOKEN_DIGITS = {}
+for _word, _digit in DIGIT_WORDS.items():
+    SPOKEN_DIGITS.setdefault(_digit, []).append(_word)
+SPOKEN_LETTERS = {}
+for _word, _letter in list(NATO_WORDS.items()) + list(LETTER_NAMES.items()):
+    SPOKEN_LETTERS.setdefault(_letter, []).append(_word)
+
+
+def random_plate(rng):
+    if rng.random() < 0.05:
+        letters = "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(rng.randint(1, 2)))
+        return f"{rng.randint(21, 29)}BH{rng.randint(0, 9999):04d}{letters}"
+    series = "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(rng.randint(0, 3)))
+    rto = str(rng.randint(1, 99)) if rng.random() < 0.5 else f"{rng.randint(1, 99):02d}"
+    return f"{rng.choice(STATES)}{rto}{series}{rng.randint(0, 9999):04d}"
+
+
+def speak_plate(rng, plate):
+    """Render a plate the way a caller (or the recognizer) might spell it out."""
+    words = []
+    i = 0
+    while i < len(plate):
+        ch = plate[i]
+        run = 1
+        while i + run < len(plate) and plate[i + run] == ch and run < 3:
+            run += 1
+        # "double u" is read as W, so a repeated U is always spelt out
+        if run > 1 and ch != "U" and rng.random() < 0.5:
+            words.append("double" if run == 2 else "triple")
+        else:
+            run = 1
+        if ch.isdigit():
+            style = rng.random()
+            if style < 0.5:
+                words.append(rng.choice(SPOKEN_DIGITS[ch]))
+            else:
+                words.append(ch)
+        else:
+            style = rng.random()
+            if style < 0.5 or ch not in SPOKEN_LETTERS:
+                words.append(ch.lower() if rng.random() < 0.5 else ch)
+            else:
+                words.append(rng.choice(SPOKEN_LETTERS[ch]))
+        i += run
+    if rng.random() < 0.2:
+        words = ["my", "vehicle", "number", "is"] + words
+    return " ".join(words)
+
+
+def bench_vehicles(args):
+    rng = random.Random(args.seed)
+    corpus = []
+    for _ in range(args.n):
+        plate = random_plate(rng)
+        corpus.append((plate, speak_plate(rng, plate)))
+
+    failures = [(p, s, normalize_vehicle_no(s)) for p, s in corpus if normalize_vehicle_no(s) != p]
+    invalid = [p for p, _ in corpus if not is_valid_plate(p)]
+    print(f"vehicles: {len(corpus)} generated plates")
+    print(f"  round-trip failures: {len(failures)}, invalid generated plates: {len(invalid)}")
+    for plate, spoken, got in failures[:10]:
+        print(f"    {plate!r} <- {spoken!r} got {got!r}")
+
+    t0 = time.perf_counter()
+    for _, spoken in corpus:
+        normalize_vehicle_no(spoken)
+    elapsed = time.perf_counter() - t0
+    print(f"  normalize: {len(corpus) / elapsed:,.0f} plates/s, {elapsed / len(corpus) * 1e6:.2f} us/plate")
+    return 1 if failures or invalid else 0
+
+
+def misheard(rng, plate):
+    """One recognizer slip: a look-alike swap, a dropped or a wrong character."""
+    chars = list(plate)
+    i = rng.randrange(len(chars))
+    swaps = {v: k for k, v in CONFUSABLE.items()}
+    roll = rng.random()
+    if roll < 0.4 and (chars[i] in CONFUSABLE or chars[i] in swaps):
+        chars[i] = CONFUSABLE.get(chars[i]) or swaps[chars[i]]
+    elif roll < 0.7:
+        del chars[i]
+    else:
+        chars[i] = rng.choice("ACDEFHJKMNPRTUVWXY34679")
+    return "".join(chars)
+
+
+def bench_lookup(args):
+    rng = random.Random(args.seed)
+    plates = list({random_plate(rng) for _ in range(args.n)})
+    t0 = time.perf_counter()
+    index = VehicleIndex(plates)
+    build = time.perf_counter() - t0
+    print(f"lookup: {len(index)} plates indexed in {build:.2f}s")
+
+    queries = [(p, misheard(rng, p)) for p in rng.sample(plates, min(args.queries, len(plates)))]
+    found = exact = 0
+    t0 = time.perf_counter()
+    for plate, heard in queries:
+        best = index.best(heard)
+        found += best is not None
+        exact += best == plate
+    elapsed = time.perf_counter() - t0
+    print(f"  {len(queries)} misheard queries: {elapsed / len(queries) * 1e6:.1f} us/query")
+    print(f"  resolved to one plate: {found}, correct: {exact}")
+
+    if args.memory:
+        tracemalloc.start()
+        traced = VehicleIndex(plates)
+        print(f"  index memory: {tracemalloc.get_traced_memory()[0] / 1e6:.0f} MB")
+        tracemalloc.stop()
+        del traced
+
+
+# ==================== BULK IMPORT / EXPORT ====================
+BULK_WHEN = ["", "tomorrow", "next monday", "in 3 days", "15 december", "2030-01-10"]
+
+
+def make_bulk_csv(rng, n):
+    buf = io.StringIO()
+    buf.write("name,vehicle_number,appointment_time\n")
+    for i in range(n):
+        buf.write(f"{rng.choice(NAMES)},{random_plate(rng)},{rng.choice(BULK_WHEN)}\n")
+    return buf.getvalue()
+
+
+def bench_bulk(args):
+    rng = random.Random(args.seed)
+    text = make_bulk_csv(rng, args.n)
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("""CREATE TABLE appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL,
+            vehicle_no TEXT NOT NULL UNIQUE, date TEXT NOT NULL, time TEXT NOT NULL,
+            bay TEXT, service TEXT NOT NULL DEFAULT 'service')""")
+        conn.execute("CREATE INDEX idx_appointments_date ON appointments(date)")
+        conn.commit()
+
+        report = bulk.import_bookings(conn, bulk.read_rows(io.StringIO(text)))
+        print(f"bulk import: {report['booked']}/{report['rows']} booked, "
+              f"{report['conflict_count']} conflicts in {report['seconds']:.2f}s "
+              f"({report['rows_per_second']} rows/s)")
+
+        clashes = conn.execute("SELECT COUNT(*) FROM (SELECT date, time FROM appointments "
+                               "GROUP BY date, time HAVING COUNT(*) > 1)").fetchone()[0]
+        print(f"  double-booked slots: {clashes}")
+
+        for fmt in ("csv", "ndjson"):
+            t0 = time.perf_counter()
+            size = sum(len(chunk) for chunk in bulk.export_bookings(conn, fmt))
+            elapsed = time.perf_counter() - t0
+            print(f"  export {fmt}: {report['booked'] / elapsed:.0f} rows/s ({size / 1e6:.1f} MB)")
+        conn.close()
+        return 1 if clashes else 0
+    finally:
+        os.unlink(path)
+
+
+# ==================== SCHEDULER ====================
+def bench_schedule(args):
+    bays = [Bay(f"Service {i + 1}", ("service",)) for i in range(args.bays)]
+    bays += [Bay(f"Wash {i + 1}", ("wash",)) for i in range(args.wash_bays)]
+    scheduler = Scheduler(bays, durations={"service": 120, "wash": 30}, hours=("09:00", "18:00"))
+    per_day = scheduler.bookings_per_day("service") + scheduler.bookings_per_day("wash")
+    print(f"schedule: {len(bays)} bays, up to {per_day:,} jobs/day")
+
+    rng = random.Random(args.seed)
+    start = date.today() + timedelta(days=1)
+    # Callers also ask for times outside opening hours ("8 am", "4" heard as 04:00)
+    hours = [None, "04:00", "08:00", "18:30", "21:00"]
+    hours += [f"{h:02d}:{m:02d}" for h in range(9, 18) for m in (0, 30)]
+    requests = [(start + timedelta(days=rng.randrange(args.days)),
+                 "wash" if rng.random() < 0.3 else "service", rng.choice(hours))
+                for _ in range(args.n)]
+
+    booked = []
+    on_time = 0
+    t0 = time.perf_counter()
+    for day, service, pref in requests:
+        placement = scheduler.find(day, service, pref)
+        scheduler.occupy(placement.date, placement.time, placement.bay, service)
+        booked.append((placement.date, placement.time, placement.bay, service))
+        on_time += placement.date == day and (pref is None or placement.time == pref)
+    elapsed = time.perf_counter() - t0
+    days = len({b[0] for b in booked})
+    print(f"  {len(booked):,} bookings in {elapsed:.3f}s: {elapsed / len(booked) * 1e6:.1f} us/booking")
+    print(f"  {len(booked) / days:,.0f} bookings/day over {days} days, "
+          f"{on_time / len(booked):.0%} got the requested day and time")
+
+    t0 = time.perf_counter()
+    for d, t, bay, service in booked[::10]:
+        scheduler.release(d, t, bay, service)
+        scheduler.occupy(d, t, bay, service)
+    elapsed = time.perf_counter() - t0
+    print(f"  release+occupy: {elapsed / len(booked[::10]) * 1e6:.1f} us")
+
+    clashes = scheduler.overlaps(booked)
+    print(f"  overlapping jobs: {len(clashes)}")
+    return 1 if clashes else 0
+
+
+# ==================== STARTUP ====================
+STARTUP_SNIPPET = (
+    "import time; t0 = time.perf_counter(); import {module}; "
+    "print('READY', time.perf_counter() - t0)"
+)
+
+
+def parse_importtime(stderr):
+    """{module: (self us, cumulative us)} from `python -X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        modules[name.strip()] = (int(self_us), int(cumulative))
+    return modules
+
+
+def bench_startup(args):
+    """Cold import of an entry module in a fresh interpreter, -X importtime style."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   APPOINTMENTS_DB=os.path.join(tmp, "appointments.db"),
+                   PROMPT_AUDIO_DIR=os.path.join(tmp, "prompt_audio"),
+                   CONVERSATION_LOG=os.path.join(tmp, "conversations.jsonl"),
+                   PROMPT_TTS="stub")
+        runs = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET.format(module=args.module)],
+                capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+            wall = time.perf_counter() - t0
+            if proc.returncode != 0:
+                print(proc.stderr[-2000:])
+                return 1
+            # Background threads may print on the same line, so search rather than split
+            ready = float(re.search(r"READY ([\d.]+)", proc.stdout).group(1))
+            runs.append((ready, wall, parse_importtime(proc.stderr)))
+
+    runs.sort(key=lambda r: r[0])
+    ready, wall, modules = runs[len(runs) // 2]
+    print(f"startup: import {args.module} (median of {args.runs})")
+    print(f"  ready after {ready * 1000:.0f} ms, process wall {wall * 1000:.0f} ms, "
+          f"{len(modules)} modules imported")
+    top = sorted(((cum, name) for name, (_, cum) in modules.items() if "." not in name),
+                 reverse=True)[:args.top]
+    print("  heaviest top-level imports (cumulative):")
+    for cum, name in top:
+        print(f"    {cum / 1000:8.1f} ms  {name}")
+    for name in args.expect_absent:
+        if name in modules:
+            print(f"  {name} was imported at startup")
+    return 1 if any(name in modules for name in args.expect_absent) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Car center assistant benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("dialogue", help="replay scripted conversations through the dialogue engine")
+    p.add_argument("-n", type=int, default=5000, help="number of conversations")
+    p.set_defaults(func=bench_dialogue)
+
+    p = sub.add_parser("dates", help="spoken date/time fast path vs dateparser")
+    p.add_argument("-n", type=int, default=100000, help="calls per case")
+    p.set_defaults(func=bench_dates)
+
+    p = sub.add_parser("vehicles", help="round-trip a random spoken plate corpus through the normalizer")
+    p.add_argument("-n", type=int, default=50000, help="number of plates")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_vehicles)
+
+    p = sub.add_parser("lookup", help="fuzzy vehicle index build time and query latency")
+    p.add_argument("-n", type=int, default=200000, help="number of indexed plates")
+    p.add_argument("--queries", type=int, default=5000)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--memory", action="store_true", help="also measure index memory (slow)")
+    p.set_defaults(func=bench_lookup)
+
+    p = sub.add_parser("bulk", help="bulk CSV import (slot allocation) and streaming export throughput")
+    p.add_argument("-n", type=int, default=100000, help="number of rows")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_bulk)
+
+    p = sub.add_parser("schedule", help="multi-bay scheduler placement rate at thousands of bookings/day")
+    p.add_argument("-n", type=int, default=50000, help="number of bookings")
+    p.add_argument("--bays", type=int, default=300, help="service bays (2 h jobs)")
+    p.add_argument("--wash-bays", type=int, default=40, help="wash bays (30 min jobs)")
+    p.add_argument("--days", type=int, default=7, help="spread of requested days")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=bench_schedule)
+
+    p = sub.add_parser("startup", help="cold-start import profile of an entry module (-X importtime)")
+    p.add_argument("--module", default="app")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--top", type=int, default=12)
+    p.add_argument("--expect-absent", nargs="*", default=[], metavar="MODULE",
+                   help="fail if any of these is imported at startup")
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
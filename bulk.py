@@ -0,0 +1,310 @@
+# bulk.py - Batch booking import/export for fleets and migrations
+# Usage:
+#   python bulk.py import car_service_bookings.csv [--db appointments.db] [--format csv|ndjson]
+#   python bulk.py export [--db appointments.db] [--format csv|ndjson] > bookings.csv
+#
+# Rows are streamed, every row is placed by the bay scheduler (scheduler.py) in
+# one pass over the existing bookings, and everything is written in a single
+# transaction.
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+
+from spoken_dates import parse_date, parse_time
+from vehicle_number import normalize_vehicle_no, is_plausible_plate
+from scheduler import scheduler_from_env
+
+EXPORT_COLUMNS = ["id", "username", "vehicle_no", "date", "time", "bay", "service"]
+CHUNK = 5000
+MAX_REPORTED_CONFLICTS = 100
+
+# Column names accepted on import (appointments.csv, car_service_bookings.csv, exports)
+FIELD_ALIASES = {
+    "name": ("username", "name", "customer", "customer_name"),
+    "vehicle": ("vehicle_no", "vehicle_number", "vehicle", "registration"),
+    "date": ("date",),
+    "time": ("time",),
+    "when": ("appointment_time", "preferred_date", "when"),
+    "service": ("service", "job"),
+}
+
+# ==================== SCHEMA ====================
+APPOINTMENTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        vehicle_no TEXT NOT NULL UNIQUE,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        bay TEXT,
+        service TEXT NOT NULL DEFAULT 'service'
+    )
+"""
+
+
+def ensure_schema(c):
+    """Create or upgrade the tables; shared by app.init_db and imports into older files."""
+    c.execute(APPOINTMENTS_TABLE_SQL)
+    # Databases from before the multi-bay scheduler
+    columns = {row[1] for row in c.execute("PRAGMA table_info(appointments)")}
+    if "bay" not in columns:
+        c.execute("ALTER TABLE appointments ADD COLUMN bay TEXT")
+    if "service" not in columns:
+        c.execute("ALTER TABLE appointments ADD COLUMN service TEXT NOT NULL DEFAULT 'service'")
+    # find_next_slot looks bookings up by day
+    c.execute("CREATE INDEX IF NOT EXISTS idx_appointments_date ON appointments(date)")
+    c.execute(HISTORY_TABLE_SQL)
+    c.execute(HISTORY_INDEX_SQL)
+
+# ==================== HISTORY ====================
+# Finished, cancelled and moved bookings live here so `appointments` only holds
+# upcoming ones (and a vehicle can book again after its service).
+HISTORY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS appointment_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        appointment_id INTEGER,
+        username TEXT NOT NULL,
+        vehicle_no TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        status TEXT NOT NULL,
+        recorded_at TEXT NOT NULL
+    )
+"""
+HISTORY_INDEX_SQL = ("CREATE INDEX IF NOT EXISTS idx_history_vehicle "
+                     "ON appointment_history(vehicle_no)")
+
+
+def record_history(c, where, params, status):
+    """Copy the appointments rows matching `where` into the history table."""
+    c.execute("INSERT INTO appointment_history "
+              "(appointment_id, username, vehicle_no, date, time, status, recorded_at) "
+              "SELECT id, username, vehicle_no, date, time, ?, ? FROM appointments WHERE " + where,
+              (status, datetime.now().isoformat(timespec="seconds"), *params))
+
+
+def archive_completed(c, today=None, vehicle=None):
+    """Move bookings dated before today (for one vehicle, or all) into history."""
+    where, params = "date < ?", [(today or date.today()).isoformat()]
+    if vehicle is not None:
+        where, params = "vehicle_no = ? AND " + where, [vehicle] + params
+    record_history(c, where, params, "completed")
+    c.execute("DELETE FROM appointments WHERE " + where, params)
+    return c.rowcount
+
+# ==================== READING ====================
+def read_rows(lines, fmt="csv"):
+    """Yield dicts from an iterable of CSV or NDJSON lines."""
+    if fmt == "ndjson":
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        yield from csv.DictReader(lines)
+
+
+def _field(row, name):
+    for key in FIELD_ALIASES[name]:
+        value = row.get(key)
+        if value:
+            return str(value).strip()
+    return ""
+
+# ==================== IMPORT ====================
+def import_bookings(conn, rows, today=None, default_name="Fleet", on_booked=None, scheduler=None,
+                    on_archived=None):
+    """Place and insert rows in one transaction; return a report dict.
+
+    Past bookings are archived first, so only vehicles with an upcoming
+    booking are refused. Rows carrying both a date and a time are kept
+    as-is (migrations) unless no bay is free then. Anything else gets the
+    earliest placement on or after its preferred date, or today.
+    `scheduler` may be a live one (app.py) that should see the new bookings;
+    otherwise one is built from the table. on_archived(vehicle) and
+    on_booked(vehicle) are called only once the import has committed.
+    """
+    started = time.perf_counter()
+    now = datetime.now()
+    today = today or now.date()
+    c = conn.cursor()
+    shared = scheduler is not None
+    live_load_day = scheduler.load_day if shared else None
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        ensure_schema(c)
+        archived = []
+        if on_archived:
+            archived = [r[0] for r in c.execute("SELECT vehicle_no FROM appointments WHERE date < ?",
+                                                 (today.isoformat(),))]
+        archive_completed(c, today)
+        known = {r[0] for r in c.execute("SELECT vehicle_no FROM appointments")}
+        if scheduler is None:
+            scheduler = scheduler_from_env()
+            for d, t, bay, service in c.execute("SELECT date, time, bay, service FROM appointments"):
+                scheduler.occupy(date.fromisoformat(d), t, bay, service)
+        else:
+            # Its cached days may miss other processes' bookings; with the write
+            # lock held, days reloaded from here on can't change under us. They
+            # are read through this connection: the scheduler's own loader opens
+            # another one, which waits on our lock once the import spills to disk.
+            scheduler.clear()
+            scheduler.load_day = lambda day: conn.execute(
+                "SELECT time, bay, service FROM appointments WHERE date=?", (day.isoformat(),)).fetchall()
+        pending = []
+        new_plates = []
+        booked = rows_seen = conflict_count = 0
+        conflicts = []
+
+        def conflict(line, vehicle, reason):
+            nonlocal conflict_count
+            conflict_count += 1
+            if len(conflicts) < MAX_REPORTED_CONFLICTS:
+                conflicts.append({"row": line, "vehicle_no": vehicle, "reason": reason})
+
+        for line, row in enumerate(rows, 1):
+            rows_seen += 1
+            vehicle = normalize_vehicle_no(_field(row, "vehicle"))
+            if not is_plausible_plate(vehicle):
+                conflict(line, vehicle, "invalid vehicle number")
+                continue
+            if vehicle in known:
+                conflict(line, vehicle, "vehicle already booked")
+                continue
+            service = _field(row, "service").lower() or "service"
+            if service not in scheduler.by_service:
+                conflict(line, vehicle, f"no bay offers {service!r}")
+                continue
+
+            raw_date, raw_time, when = _field(row, "date"), _field(row, "time"), _field(row, "when")
+            if raw_date and raw_time:
+                day, slot = parse_date(raw_date, today), parse_time(raw_time)
+                if day is None or slot is None:
+                    conflict(line, vehicle, "unreadable date or time")
+                    continue
+                bay = scheduler.bay_at(day, slot, service)
+                if bay is None:
+                    conflict(line, vehicle, "slot taken")
+                    continue
+            else:
+                preferred = parse_date(raw_date or when, today) if (raw_date or when) else today
+                pref_time = parse_time(raw_time) if raw_time else None
+                day, slot, bay = scheduler.find(max(preferred or today, today), service, pref_time, now=now)
+            scheduler.occupy(day, slot, bay, service)
+
+            known.add(vehicle)
+            new_plates.append(vehicle)
+            name = (_field(row, "name") or default_name).title()
+            pending.append((name, vehicle, day.isoformat(), slot, bay, service))
+            if len(pending) >= CHUNK:
+                booked += _flush(c, pending)
+        booked += _flush(c, pending)
+        conn.commit()
+        for vehicle in archived:
+            # `known` now holds what's in the table, including plates re-booked here
+            if vehicle not in known:
+                on_archived(vehicle)
+        if on_booked:
+            for vehicle in new_plates:
+                on_booked(vehicle)
+    except Exception:
+        conn.rollback()
+        # Bookings already placed in a shared scheduler never reached the table
+        if scheduler is not None:
+            scheduler.clear()
+        raise
+    finally:
+        if shared:
+            scheduler.load_day = live_load_day
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows_seen,
+        "booked": booked,
+        "conflict_count": conflict_count,
+        "conflicts": conflicts,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows_seen / elapsed) if elapsed else rows_seen,
+    }
+
+
+def _flush(c, pending):
+    c.executemany("INSERT INTO appointments (username, vehicle_no, date, time, bay, service) "
+                  "VALUES (?, ?, ?, ?, ?, ?)", pending)
+    n = len(pending)
+    pending.clear()
+    return n
+
+# ==================== EXPORT ====================
+def iter_appointments(conn, batch=CHUNK):
+    c = conn.cursor()
+    c.execute("SELECT id, username, vehicle_no, date, time, bay, service FROM appointments "
+              "ORDER BY date ASC, time ASC")
+    while True:
+        rows = c.fetchmany(batch)
+        if not rows:
+            return
+        yield rows
+
+
+def export_bookings(conn, fmt="csv"):
+    """Yield the appointments table as CSV or NDJSON text chunks."""
+    if fmt == "ndjson":
+        for rows in iter_appointments(conn):
+            yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, r))) + "\n" for r in rows)
+        return
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in iter_appointments(conn):
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+# ==================== CLI ====================
+def _format_for(path, fmt):
+    if fmt:
+        return fmt
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk booking import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("import", help="import bookings from CSV/NDJSON ('-' for stdin)")
+    p.add_argument("path")
+    p.add_argument("--db", default="appointments.db")
+    p.add_argument("--format", choices=["csv", "ndjson"])
+    p = sub.add_parser("export", help="write all bookings to stdout")
+    p.add_argument("--db", default="appointments.db")
+    p.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        if args.command == "import":
+            fmt = _format_for(args.path, args.format)
+            if args.path == "-":
+                report = import_bookings(conn, read_rows(sys.stdin, fmt))
+            else:
+                with open(args.path, newline="") as f:
+                    report = import_bookings(conn, read_rows(f, fmt))
+            print(json.dumps(report, indent=2))
+            return 1 if report["conflict_count"] else 0
+        for chunk in export_bookings(conn, args.format):
+            sys.stdout.write(chunk)
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
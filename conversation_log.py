@@ -0,0 +1,219 @@
+# conversation_log.py - Append-only JSONL log of dialogue turns, and a replay tool
+# Usage:
+#   python conversation_log.py replay 'logs/conversations.*' [--check] [--repeat N]
+#
+# ConversationLog.record() only puts the entry on a bounded queue; a single
+# background thread batches entries to disk, rotates the file past max_bytes
+# and gzips the rotated file. If the disk falls behind, entries are dropped
+# (and counted) rather than making a caller wait. Each process writes its own
+# file (the pid goes into the name), so gunicorn workers never rotate a file
+# another worker is still appending to.
+#
+# Entries hold what callers said, including names and vehicle numbers; only
+# `backups` rotated files are kept.
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+class ConversationLog:
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=10,
+                 batch_size=256, flush_interval=0.5, queue_size=10000):
+        root, ext = os.path.splitext(path)
+        self.path = f"{root}.{os.getpid()}{ext}"
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def record(self, entry):
+        """Queue one entry for writing; never blocks."""
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5):
+        if self.thread.is_alive():
+            # Blocking here is fine: close() runs at shutdown, not per request
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+        if self.dropped:
+            print(f"Conversation log: {self.dropped} entries dropped (writer fell behind)")
+
+    # ---------- writer thread ----------
+    def _run(self):
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                batch, stop = self._next_batch()
+                if batch:
+                    f.write("".join(json.dumps(e, default=str) + "\n" for e in batch))
+                    f.flush()
+                    self.written += len(batch)
+                    if f.tell() >= self.max_bytes:
+                        f.close()
+                        self._rotate()
+                        f = open(self.path, "a", encoding="utf-8")
+                if stop:
+                    return
+        except Exception as e:
+            print(f"Conversation log writer stopped: {e}")
+        finally:
+            f.close()
+
+    def _next_batch(self):
+        """Wait for one entry, then take whatever else arrives within flush_interval."""
+        batch = []
+        item = self.queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch, False
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, False
+
+    def _rotate(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        rotated = f"{self.path}.{stamp}"
+        os.replace(self.path, rotated)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        old = sorted(glob.glob(glob.escape(self.path) + ".*.gz"))
+        for stale in old[:-self.backups] if self.backups else old:
+            os.remove(stale)
+
+# ==================== READING ====================
+def read_entries(paths):
+    """Entries from plain or gzipped JSONL files, oldest file first."""
+    def age(path):
+        return (0, path) if path.endswith(".gz") else (1, path)
+    for path in sorted(paths, key=age):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def split_sessions(entries):
+    """[(session_id, [entries])] in log order; a "start" entry opens a new session."""
+    open_sessions = {}
+    sessions = []
+    for entry in entries:
+        sid = entry.get("session_id")
+        if entry.get("input") is None or sid not in open_sessions:
+            open_sessions[sid] = []
+            sessions.append((sid, open_sessions[sid]))
+        open_sessions[sid].append(entry)
+        if entry.get("done"):
+            open_sessions.pop(sid, None)
+    return sessions
+
+# ==================== REPLAY ====================
+def replay_sessions(engine, sessions):
+    """Feed logged inputs back through `engine`.
+
+    Returns (turns, mismatches) where a mismatch is a turn whose next stage
+    or prompt keys differ from the log. Prompt keys rather than reply text
+    are compared, so dates and slots that depend on the database don't count.
+    """
+    from dialogue import Session
+
+    turns = 0
+    mismatches = []
+    for sid, entries in sessions:
+        session = Session()
+        for entry in entries:
+            if entry.get("input") is None:
+                turn = engine.start(session)
+            else:
+                if session.stage != entry.get("stage"):
+                    # Only started mid-conversation in the log; follow it from here
+                    session.stage = entry.get("stage")
+                turn = engine.step(session, entry["input"])
+            turns += 1
+            prompts = [getattr(r, "key", None) for r in turn.replies]
+            stage = "done" if turn.done else session.stage
+            expected_stage = "done" if entry.get("done") else entry.get("next_stage")
+            if stage != expected_stage or prompts != entry.get("prompts"):
+                mismatches.append({
+                    "session_id": sid, "stage": entry.get("stage"), "input": entry.get("input"),
+                    "expected": [expected_stage, entry.get("prompts")], "got": [stage, prompts],
+                })
+            if turn.done:
+                break
+    return turns, mismatches
+
+
+def cmd_replay(args):
+    from benchmark import MemoryBookings, make_engine
+
+    paths = [p for pattern in args.paths for p in (glob.glob(pattern) or [pattern])]
+    # Several workers' files interleave; the timestamp puts their turns back in order
+    entries = sorted(read_entries(paths), key=lambda e: e.get("ts", ""))
+    sessions = split_sessions(entries)
+    print(f"replay: {len(sessions)} sessions from {len(paths)} file(s)")
+    if not sessions:
+        return 0
+
+    elapsed = 0.0
+    for _ in range(args.repeat):
+        # Fresh in-memory bookings per pass, filled in log order as sessions book
+        engine = make_engine(MemoryBookings())
+        t0 = time.perf_counter()
+        turns, mismatches = replay_sessions(engine, sessions)
+        elapsed += time.perf_counter() - t0
+    print(f"  {turns} turns per pass, {turns * args.repeat / elapsed:,.0f} turns/s, "
+          f"{elapsed / (turns * args.repeat) * 1e6:.1f} us/turn")
+    print(f"  mismatches: {len(mismatches)}")
+    for m in mismatches[:args.show]:
+        print(f"    {m['session_id']} [{m['stage']}] {m['input']!r}: "
+              f"expected {m['expected']}, got {m['got']}")
+    return 1 if args.check and mismatches else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversation log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("replay", help="replay logged sessions through the dialogue engine")
+    p.add_argument("paths", nargs="+", help="log files (.jsonl or rotated .gz, one set per process); globs allowed")
+    p.add_argument("--check", action="store_true", help="exit 1 if any turn differs from the log")
+    p.add_argument("--repeat", type=int, default=1, help="replay the whole log N times (benchmarking)")
+    p.add_argument("--show", type=int, default=10, help="mismatches to print")
+    p.set_defaults(func=cmd_replay)
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
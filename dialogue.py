@@ -0,0 +1,417 @@
+# dialogue.py - Table-driven booking dialogue shared by app.py and voice_assistant.py
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import nullcontext
+from datetime import datetime
+
+# ==================== INTENTS ====================
+# Keywords are matched as whole words, so "no" never fires on "know" or "november".
+INTENT_KEYWORDS = {
+    "yes": ["yes", "yeah", "yep", "correct", "right", "haan", "ji"],
+    # Not a bare "not": "not yet, check my car status" isn't a no
+    "no": ["no", "nope", "nah", "wrong", "incorrect", "nahi", "not correct", "not right"],
+    "book": ["book", "booking"],
+    # Nouns that only mean "book" at the main menu; "no thanks, the service was
+    # great" at the end of a call is a goodbye
+    "appointment": ["appointment", "service"],
+    "status": ["status", "check", "ready"],
+    "cancel": ["cancel", "cancellation"],
+    # Bare "change"/"move" also mean "change the oil", which is a booking
+    "reschedule": ["reschedule", "postpone", "change my appointment", "change my booking",
+                   "move my appointment", "move my booking", "change the date"],
+    "thanks": ["thank", "thanks", "thank you", "bye", "goodbye"],
+}
+
+
+def compile_intents(table):
+    """Build one alternation regex with a named group per intent."""
+    groups = []
+    for intent, words in table.items():
+        alts = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+        groups.append(f"(?P<{intent}>{alts})")
+    return re.compile(r"\b(?:" + "|".join(groups) + r")\b")
+
+
+INTENT_RE = compile_intents(INTENT_KEYWORDS)
+
+
+def match_intents(text):
+    """Return the set of intents whose keywords appear in text."""
+    return {m.lastgroup for m in INTENT_RE.finditer(text.lower())}
+
+
+# ==================== PROMPTS ====================
+PROMPTS = {
+    "welcome": "Good morning! Welcome to Deewanshi Car Center. May I know your name please?",
+    "echo": "You said: {value}. Is this correct? Say yes or no.",
+    "confirmed": "Okay, confirmed!",
+    "menu": "Thank you {first_name}! How can I help you today? "
+            "Say 'book appointment', 'car status', 'reschedule' or 'cancel'.",
+    "menu_retry": "Please say 'book appointment', 'car status', 'reschedule' or 'cancel'.",
+    "name_retry": "Sorry, please say your name again.",
+    "ask_vehicle": "Please tell me your vehicle number.",
+    "ask_status_vehicle": "Please say your vehicle number to check status.",
+    "vehicle_invalid": "That doesn't sound right. Please say your vehicle number again.",
+    "vehicle_retry": "Please say your vehicle number again.",
+    "ask_date": "What date would you like? For example, tomorrow, 20 November, or next week.",
+    "date_retry": "Please say the date again.",
+    "ask_time": "What time would you prefer? Like 10 AM, 2 PM, or 4 PM?",
+    "time_retry": "Please say the time again.",
+    "booked": "Excellent! Your appointment is booked for {nice_date} at {time}.",
+    "booked_thanks": "We will take good care of your car {vehicle}. Thank you!",
+    "already_booked": "Sorry, {vehicle} already has an appointment.",
+    "slot_taken": "Sorry, the slots I found were taken while we were talking. Please try again in a moment.",
+    "anything_else": "Do you need any other help?",
+    "assist_more": "How else may I assist you?",
+    "goodbye": "Thank you {first_name}! Have a wonderful day!",
+    "status_found": "Hello {first_name}! Your car {vehicle} will be ready on {nice_date} at {time}.",
+    "status_missing": "No appointment found for this vehicle number.",
+    "status_did_you_mean": "I couldn't find that number. Did you mean {vehicle}? Say yes or no.",
+    "ask_cancel_vehicle": "Please say the vehicle number of the booking to cancel.",
+    "cancel_check": "{vehicle} is booked for {nice_date} at {time}. Shall I cancel it? Say yes or no.",
+    "cancelled": "Your appointment for {vehicle} has been cancelled.",
+    "cancel_kept": "Okay, your appointment is unchanged. Do you need any other help?",
+    "ask_reschedule_vehicle": "Please say the vehicle number of the booking to move.",
+    "reschedule_check": "{vehicle} is booked for {nice_date} at {time}. What date would you like instead?",
+    "rescheduled": "Done! {vehicle} is now booked for {nice_date} at {time}.",
+    "reschedule_failed": "Sorry, {nice_date} at {time} is no longer available. "
+                         "Your booking is unchanged.",
+}
+
+# book() returns this when the slot it was given went to someone else first
+SLOT_TAKEN = "slot_taken"
+# Fresh slot searches before giving up on a booking that keeps losing its slot
+BOOK_ATTEMPTS = 3
+
+# ==================== STAGES ====================
+# handler: capture | confirm | menu | action
+#   capture - store the parsed input in `field`, echo it back and go to `next`
+#   confirm - on yes say "confirmed", then `prompt` (or run `action`) and go to `next`;
+#             otherwise say `retry_prompt` and go back to `retry`
+#   menu    - first matching (intent, prompt, next, action) route wins, else `prompt`/`next`
+#   action  - run `action` on the raw input (lookup actions then say `prompt` and go to `next`)
+Stage = namedtuple(
+    "Stage",
+    ["handler", "field", "next", "retry", "prompt", "retry_prompt", "routes", "action"],
+    defaults=(None,) * 7,
+)
+
+# cancel/reschedule come first: "cancel my appointment" also says "appointment"
+CANCEL_ROUTE = ("cancel", "ask_cancel_vehicle", "cancel_vehicle", None)
+RESCHEDULE_ROUTE = ("reschedule", "ask_reschedule_vehicle", "reschedule_vehicle", None)
+BOOK_ROUTE = ("book", "ask_vehicle", "get_vehicle", None)
+APPOINTMENT_ROUTE = ("appointment", "ask_vehicle", "get_vehicle", None)
+STATUS_ROUTE = ("status", "ask_status_vehicle", "check_status", None)
+MENU_ROUTES = (CANCEL_ROUTE, RESCHEDULE_ROUTE, BOOK_ROUTE, APPOINTMENT_ROUTE, STATUS_ROUTE)
+
+STAGES = {
+    "ask_name": Stage("capture", field="user_name", next="confirm_name", retry_prompt="name_retry"),
+    "confirm_name": Stage("confirm", next="main_menu", retry="ask_name",
+                          prompt="menu", retry_prompt="name_retry"),
+    "main_menu": Stage("menu", next="main_menu", prompt="menu_retry", routes=MENU_ROUTES),
+    "get_vehicle": Stage("capture", field="vehicle_no", next="confirm_vehicle",
+                         retry_prompt="vehicle_invalid"),
+    "confirm_vehicle": Stage("confirm", next="get_date", retry="get_vehicle",
+                             prompt="ask_date", retry_prompt="vehicle_retry"),
+    "get_date": Stage("capture", field="pref_date", next="confirm_date", retry_prompt="date_retry"),
+    "confirm_date": Stage("confirm", next="get_time", retry="get_date",
+                          prompt="ask_time", retry_prompt="date_retry"),
+    "get_time": Stage("capture", field="pref_time", next="confirm_time", retry_prompt="time_retry"),
+    "confirm_time": Stage("confirm", retry="get_time", retry_prompt="time_retry", action="book"),
+    # "no, I want to check my car status" asks for something else, not goodbye,
+    # but a bare "appointment"/"service" next to a no or thanks doesn't
+    "final_ask": Stage("menu", next="main_menu", prompt="assist_more", routes=(
+        CANCEL_ROUTE, RESCHEDULE_ROUTE, BOOK_ROUTE, STATUS_ROUTE,
+        ("no", "goodbye", None, "finish"),
+        ("thanks", "goodbye", None, "finish"),
+        APPOINTMENT_ROUTE,
+    )),
+    "check_status": Stage("action", action="status"),
+    # A fuzzy hit may be another customer's booking; nothing is read out until confirmed
+    "confirm_status_vehicle": Stage("confirm", retry="check_status",
+                                    retry_prompt="ask_status_vehicle", action="status_confirmed"),
+    "cancel_vehicle": Stage("action", next="confirm_cancel", prompt="cancel_check",
+                            action="find_booking"),
+    "confirm_cancel": Stage("confirm", retry="final_ask", retry_prompt="cancel_kept",
+                            action="cancel"),
+    "reschedule_vehicle": Stage("action", next="get_new_date", prompt="reschedule_check",
+                                action="find_booking"),
+    "get_new_date": Stage("capture", field="pref_date", next="confirm_new_date",
+                          retry_prompt="date_retry"),
+    "confirm_new_date": Stage("confirm", next="get_new_time", retry="get_new_date",
+                              prompt="ask_time", retry_prompt="date_retry"),
+    "get_new_time": Stage("capture", field="pref_time", next="confirm_new_time",
+                          retry_prompt="time_retry"),
+    "confirm_new_time": Stage("confirm", retry="get_new_time", retry_prompt="time_retry",
+                              action="reschedule"),
+}
+
+# ==================== SESSION STATE ====================
+class Session:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stage = "welcome"
+        self.user_name = None
+        self.vehicle_no = None
+        self.pref_date = None
+        self.pref_time = None
+        self.service = "service"
+
+
+class SessionStore:
+    """Sessions by id, so concurrent callers don't share one conversation.
+
+    Least recently used sessions are dropped past `max_sessions`.
+    """
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session for session_id, creating it if needed."""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = Session()
+                if len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            else:
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def discard(self, session_id):
+        with self.lock:
+            self.sessions.pop(session_id, None)
+
+
+Turn = namedtuple("Turn", ["replies", "done"])
+
+
+class Reply(str):
+    """A reply line that remembers which prompt and fields produced it,
+    so prerecorded audio can be used for the fixed parts (prompt_audio.py)."""
+
+    def __new__(cls, text, key=None, fields=None):
+        reply = super().__new__(cls, text)
+        reply.key = key
+        reply.fields = fields or {}
+        return reply
+
+
+def first_name(name):
+    parts = (name or "").split()
+    return parts[0] if parts else ""
+
+
+def nice_date(date_str):
+    return datetime.strptime(date_str, "%Y-%m-%d").strftime("%d %B %Y")
+
+
+# ==================== ENGINE ====================
+class DialogueEngine:
+    """Drives a Session through STAGES.
+
+    The storage side is injected so the web app, the CLI and the benchmarks
+    can share one flow:
+        find_slot(pref_date, pref_time, service) -> (date "YYYY-MM-DD", time "HH:MM")
+        book(name, vehicle, date, time) -> True, False (vehicle already booked) or SLOT_TAKEN
+        lookup(vehicle) -> (name, date, time, matched vehicle, service) or None
+        cancel(vehicle) -> bool
+        reschedule(vehicle, date, time) -> bool
+        normalize_vehicle(text) -> str
+        validate_vehicle(vehicle) -> bool    (default: at least 6 characters)
+    `span(name)` is an optional context-manager factory used to time intent matching.
+    Slot search and insert/move run under `booking_lock` so two callers can't take one slot.
+    """
+
+    def __init__(self, find_slot, book, lookup, normalize_vehicle, validate_vehicle=None,
+                 stages=STAGES, prompts=PROMPTS, span=None, booking_lock=None,
+                 cancel=None, reschedule=None):
+        self.find_slot = find_slot
+        self.book = book
+        self.lookup = lookup
+        self.cancel = cancel
+        self.reschedule = reschedule
+        self.normalize_vehicle = normalize_vehicle
+        self.validate_vehicle = validate_vehicle or (lambda vehicle: len(vehicle) >= 6)
+        self.prompts = prompts
+        self.span = span or (lambda name: nullcontext())
+        self.booking_lock = booking_lock or nullcontext()
+        handlers = {
+            "capture": self._capture,
+            "confirm": self._confirm,
+            "menu": self._menu,
+            "action": self._action,
+        }
+        self.actions = {
+            "book": self._book,
+            "status": self._status,
+            "status_confirmed": self._status_confirmed,
+            "finish": self._finish,
+            "find_booking": self._find_booking,
+            "cancel": self._cancel,
+            "reschedule": self._reschedule,
+        }
+        self.parsers = {
+            "user_name": self._parse_name,
+            "vehicle_no": self._parse_vehicle,
+            "pref_date": self._parse_text,
+            "pref_time": self._parse_text,
+        }
+        self.dispatch = {name: (handlers[s.handler], s) for name, s in stages.items()}
+
+    def say(self, key, **fields):
+        return Reply(self.prompts[key].format(**fields), key, fields)
+
+    def start(self, session):
+        session.reset()
+        session.stage = "ask_name"
+        return Turn([self.say("welcome")], False)
+
+    def step(self, session, text):
+        entry = self.dispatch.get(session.stage)
+        if entry is None:
+            return self.start(session)
+        handler, stage = entry
+        return handler(session, stage, text.strip().lower())
+
+    # ---------- stage handlers ----------
+    def _capture(self, session, stage, text):
+        parsed = self.parsers[stage.field](text)
+        if parsed is None:
+            return Turn([self.say(stage.retry_prompt)], False)
+        value, shown = parsed
+        setattr(session, stage.field, value)
+        session.stage = stage.next
+        return Turn([self.say("echo", value=shown)], False)
+
+    def _confirm(self, session, stage, text):
+        with self.span("intent"):
+            intents = match_intents(text)
+        if "yes" not in intents or "no" in intents:
+            session.stage = stage.retry
+            return Turn([self.say(stage.retry_prompt)], False)
+        replies = [self.say("confirmed")]
+        if stage.action:
+            turn = self.actions[stage.action](session, stage, text)
+            return Turn(replies + turn.replies, turn.done)
+        session.stage = stage.next
+        replies.append(self.say(stage.prompt, first_name=first_name(session.user_name)))
+        return Turn(replies, False)
+
+    def _menu(self, session, stage, text):
+        with self.span("intent"):
+            intents = match_intents(text)
+        for intent, prompt, next_stage, action in stage.routes:
+            if intent in intents:
+                reply = self.say(prompt, first_name=first_name(session.user_name))
+                if action:
+                    turn = self.actions[action](session, stage, text)
+                    return Turn([reply] + turn.replies, turn.done)
+                session.stage = next_stage
+                return Turn([reply], False)
+        session.stage = stage.next
+        return Turn([self.say(stage.prompt)], False)
+
+    def _action(self, session, stage, text):
+        return self.actions[stage.action](session, stage, text)
+
+    # ---------- input parsers: return (stored, spoken) or None ----------
+    def _parse_name(self, text):
+        name = text.title()
+        return (name, name) if name else None
+
+    def _parse_vehicle(self, text):
+        vehicle = self.normalize_vehicle(text)
+        return (vehicle, vehicle) if self.validate_vehicle(vehicle) else None
+
+    def _parse_text(self, text):
+        return (text, text.title()) if text else None
+
+    # ---------- actions ----------
+    def _book(self, session, stage, text):
+        with self.booking_lock:
+            for _ in range(BOOK_ATTEMPTS):
+                date_slot, time_slot = self.find_slot(session.pref_date, session.pref_time, session.service)
+                booked = self.book(session.user_name, session.vehicle_no, date_slot, time_slot)
+                if booked != SLOT_TAKEN:
+                    break
+        if booked == SLOT_TAKEN:
+            replies = [self.say("slot_taken")]
+        elif booked:
+            replies = [
+                self.say("booked", nice_date=nice_date(date_slot), time=time_slot),
+                self.say("booked_thanks", vehicle=session.vehicle_no),
+            ]
+        else:
+            replies = [self.say("already_booked", vehicle=session.vehicle_no)]
+        replies.append(self.say("anything_else"))
+        session.stage = "final_ask"
+        return Turn(replies, False)
+
+    def _status(self, session, stage, text):
+        spoken = self.normalize_vehicle(text)
+        appt = self.lookup(spoken)
+        if appt and appt[3] != spoken:
+            session.vehicle_no = appt[3]
+            session.stage = "confirm_status_vehicle"
+            return Turn([self.say("status_did_you_mean", vehicle=appt[3])], False)
+        return self._status_reply(session, appt)
+
+    def _status_confirmed(self, session, stage, text):
+        return self._status_reply(session, self.lookup(session.vehicle_no))
+
+    def _status_reply(self, session, appt):
+        if appt:
+            name, date, time, vehicle, service = appt
+            reply = self.say("status_found", first_name=first_name(name), vehicle=vehicle,
+                             nice_date=nice_date(date), time=time)
+        else:
+            reply = self.say("status_missing")
+        session.reset()
+        return Turn([reply], True)
+
+    def _finish(self, session, stage, text):
+        session.reset()
+        return Turn([], True)
+
+    def _find_booking(self, session, stage, text):
+        spoken = self.normalize_vehicle(text)
+        appt = self.lookup(spoken)
+        # Cancelling or moving needs the exact plate: a near miss from the
+        # fuzzy lookup may be someone else's booking
+        if not appt or appt[3] != spoken:
+            session.stage = "final_ask"
+            return Turn([self.say("status_missing"), self.say("anything_else")], False)
+        name, date, time, vehicle, service = appt
+        session.vehicle_no = vehicle
+        # The new slot has to fit this job, not the default one
+        session.service = service
+        session.user_name = session.user_name or name
+        session.stage = stage.next
+        return Turn([self.say(stage.prompt, vehicle=vehicle, nice_date=nice_date(date), time=time)],
+                    False)
+
+    def _cancel(self, session, stage, text):
+        with self.booking_lock:
+            cancelled = self.cancel(session.vehicle_no)
+        reply = self.say("cancelled" if cancelled else "status_missing", vehicle=session.vehicle_no)
+        session.stage = "final_ask"
+        return Turn([reply, self.say("anything_else")], False)
+
+    def _reschedule(self, session, stage, text):
+        with self.booking_lock:
+            date_slot, time_slot = self.find_slot(session.pref_date, session.pref_time, session.service)
+            moved = self.reschedule(session.vehicle_no, date_slot, time_slot)
+        if moved:
+            reply = self.say("rescheduled", vehicle=session.vehicle_no,
+                             nice_date=nice_date(date_slot), time=time_slot)
+        else:
+            reply = self.say("reschedule_failed", nice_date=nice_date(date_slot), time=time_slot)
+        session.stage = "final_ask"
+        return Turn([reply, self.say("anything_else")], False)
@@ -0,0 +1,320 @@
+# loadtest.py - End-to-end load test and hot-path micro-benchmarks for app.py
+# Usage:
+#   python loadtest.py load  [--callers 200] [--concurrency 20] [--url http://127.0.0.1:5000]
+#   python loadtest.py compare [--callers 200] [--concurrency 200] [--tts-ms 300]
+#   python loadtest.py micro [-n 500]
+#
+# Without --url the app is imported in-process against a temporary SQLite file
+# (APPOINTMENTS_DB) and driven through Flask's test client. TTS is stubbed out
+# either way for the in-process run, so only dialogue + DB time is measured.
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmark import booking_script, status_script, random_plate, speak_plate
+from vehicle_number import normalize_vehicle_no
+from scheduler import scheduler_from_env
+
+
+def load_app():
+    """Import app.py against a throwaway database with TTS switched off."""
+    if "APPOINTMENTS_DB" not in os.environ:
+        fd, path = tempfile.mkstemp(prefix="loadtest_", suffix=".db")
+        os.close(fd)
+        os.remove(path)
+        os.environ["APPOINTMENTS_DB"] = path
+    # Keep the turn log next to the throwaway database; replay it with conversation_log.py
+    os.environ.setdefault("CONVERSATION_LOG", os.environ["APPOINTMENTS_DB"] + ".conversations.jsonl")
+    import app as app_module
+    app_module.speak = lambda text: None
+    return app_module
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+# ==================== TRANSPORTS ====================
+class InProcessClient:
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def post(self, path, payload):
+        return self.client.post(path, json=payload).get_json()
+
+    def get(self, path):
+        return self.client.get(path).get_json()
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def post(self, path, payload):
+        req = urllib.request.Request(
+            self.base_url + path, data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(req) as resp:
+            return json.load(resp)
+
+    def get(self, path):
+        with urllib.request.urlopen(self.base_url + path) as resp:
+            return json.load(resp)
+
+# ==================== SIMULATED CALLERS ====================
+class Caller:
+    """One scripted conversation plus what the app is expected to answer."""
+
+    def __init__(self, kind, script, plate):
+        self.kind = kind
+        self.script = script
+        self.plate = plate
+        self.latencies = []
+        self.replies = []
+        self.done = False
+        self.error = None
+
+    def run(self, client):
+        session_id = uuid.uuid4().hex
+        try:
+            t0 = time.perf_counter()
+            reply = client.post("/start", {"session_id": session_id})
+            self.latencies.append(time.perf_counter() - t0)
+            self.replies.append(reply["reply"])
+            for text in self.script:
+                t0 = time.perf_counter()
+                reply = client.post("/listen", {"message": text, "session_id": session_id})
+                self.latencies.append(time.perf_counter() - t0)
+                self.replies.append(reply["reply"])
+                if reply.get("done"):
+                    self.done = True
+                    break
+        except Exception as e:
+            self.error = repr(e)
+        return self
+
+    def succeeded(self):
+        text = " ".join(self.replies)
+        if self.kind == "book":
+            return "is booked for" in text and self.plate in text
+        return f"Your car {self.plate} will be ready" in text
+
+
+def make_callers(n, seed):
+    rng = random.Random(seed)
+    plates = set()
+    while len(plates) < n:
+        plates.add(random_plate(rng))
+    bookers = [Caller("book", booking_script(rng, speak_plate(rng, p)), p) for p in sorted(plates)]
+    checkers = [Caller("status", status_script(rng, speak_plate(rng, c.plate)), c.plate)
+                for c in bookers]
+    return bookers, checkers
+
+
+def run_phase(name, callers, client_factory, concurrency):
+    local = threading.local()
+
+    def work(caller):
+        if not hasattr(local, "client"):
+            local.client = client_factory()
+        return caller.run(local.client)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(work, callers))
+    elapsed = time.perf_counter() - t0
+
+    latencies = sorted(l for c in callers for l in c.latencies)
+    errors = [c.error for c in callers if c.error]
+    ok = sum(c.succeeded() for c in callers)
+    print(f"{name}: {len(callers)} callers, {len(latencies)} turns in {elapsed:.2f}s "
+          f"(concurrency {concurrency})")
+    print(f"  throughput: {len(latencies) / elapsed:,.1f} turns/s, {len(callers) / elapsed:,.1f} conversations/s")
+    print(f"  latency ms: p50 {percentile(latencies, 50) * 1000:.2f}  p95 {percentile(latencies, 95) * 1000:.2f}  "
+          f"p99 {percentile(latencies, 99) * 1000:.2f}  max {latencies[-1] * 1000 if latencies else 0:.2f}")
+    print(f"  succeeded: {ok}/{len(callers)}, errors: {len(errors)}")
+    for e in errors[:5]:
+        print(f"    {e}")
+    return {
+        "ok": ok == len(callers) and not errors,
+        "turns_per_s": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def check_bookings(client, bookers):
+    """Every booker has exactly one row, and no bay holds two overlapping jobs."""
+    rows = client.get("/admin/database")
+    by_vehicle = {}
+    for row in rows:
+        by_vehicle.setdefault(row["vehicle_no"], []).append(row)
+    missing = [c.plate for c in bookers if len(by_vehicle.get(c.plate, [])) != 1]
+    # Same bay and service settings as the server (both read the environment)
+    clashes = scheduler_from_env().overlaps(
+        (row["date"], row["time"], row.get("bay"), row.get("service", "service")) for row in rows)
+    print(f"bookings: {len(rows)} rows, missing/duplicated vehicles: {len(missing)}, "
+          f"double-booked slots: {len(clashes)}")
+    for d, bay, t in clashes[:5]:
+        print(f"    {d} {t} in {bay}")
+    return not missing and not clashes
+
+
+def cmd_load(args):
+    if args.url:
+        client_factory = lambda: HttpClient(args.url)
+    else:
+        app_module = load_app()
+        print(f"in-process app, database {app_module.DB_FILE}")
+        client_factory = lambda: InProcessClient(app_module.app)
+
+    bookers, checkers = make_callers(args.callers, args.seed)
+    ok = run_phase("booking", bookers, client_factory, args.concurrency)["ok"]
+    ok &= run_phase("status", checkers, client_factory, args.concurrency)["ok"]
+    ok &= check_bookings(client_factory(), bookers)
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+# ==================== SYNC vs ASYNC SERVING ====================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url + "/admin/database", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} not ready after {timeout}s")
+
+
+def serve_and_load(mode, command, port, args):
+    fd, db = tempfile.mkstemp(prefix=f"loadtest_{mode}_", suffix=".db")
+    os.close(fd)
+    os.remove(db)
+    env = dict(os.environ, APPOINTMENTS_DB=db, SIMULATED_TTS_MS=str(args.tts_ms),
+               CONVERSATION_LOG=os.environ.get("CONVERSATION_LOG", db + ".conversations.jsonl"))
+    url = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(url, proc, args.startup_timeout)
+        print(f"--- {mode}: {' '.join(command[2:])}")
+        bookers, checkers = make_callers(args.callers, args.seed)
+        client_factory = lambda: HttpClient(url)
+        stats = run_phase("booking", bookers, client_factory, args.concurrency)
+        status = run_phase("status", checkers, client_factory, args.concurrency)
+        stats["ok"] = stats["ok"] and status["ok"] and check_bookings(client_factory(), bookers)
+        return stats
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        if os.path.exists(db):
+            os.remove(db)
+
+
+def cmd_compare(args):
+    modes = {
+        "sync": [sys.executable, "-m", "gunicorn", "app:app", "--workers", "1",
+                 "--threads", str(args.sync_threads), "--bind", "127.0.0.1:{port}"],
+        "async": [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1",
+                  "--port", "{port}", "--log-level", "warning"],
+    }
+    results = {}
+    for mode, template in modes.items():
+        port = free_port()
+        command = [part.format(port=port) for part in template]
+        results[mode] = serve_and_load(mode, command, port, args)
+
+    print(f"\n{'mode':<8}{'turns/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  correct")
+    for mode, s in results.items():
+        print(f"{mode:<8}{s['turns_per_s']:>10.1f}{s['p50'] * 1000:>10.1f}{s['p95'] * 1000:>10.1f}"
+              f"{s['p99'] * 1000:>10.1f}  {'yes' if s['ok'] else 'NO'}")
+    return 0 if all(s["ok"] for s in results.values()) else 1
+
+# ==================== MICRO-BENCHMARKS ====================
+def _time(label, fn, inputs):
+    t0 = time.perf_counter()
+    for item in inputs:
+        fn(item)
+    per_call = (time.perf_counter() - t0) / len(inputs) * 1e6
+    print(f"  {label:<34} {per_call:10.1f} us/call")
+    return per_call
+
+
+def cmd_micro(args):
+    app_module = load_app()
+    rng = random.Random(args.seed)
+    plates = sorted({random_plate(rng) for _ in range(args.n)})
+    spoken = [speak_plate(rng, p) for p in plates]
+    dates = ["tomorrow", "next week", "20 november", "monday", "in 3 days"]
+    print(f"micro: {len(plates)} inputs, database {app_module.DB_FILE}")
+
+    _time("normalize_vehicle_no", normalize_vehicle_no, spoken)
+
+    # Fill consecutive days from tomorrow, three slots a day, like real traffic
+    start = date.today() + timedelta(days=1)
+    slots = ["10:00", "13:00", "16:00"]
+    rows = [(p, (start + timedelta(days=i // 3)).isoformat(), slots[i % 3]) for i, p in enumerate(plates)]
+    _time("book_appointment (insert+commit)",
+          lambda row: app_module.book_appointment("Load Test", *row), rows)
+    _time("find_next_slot (filled DB)",
+          lambda i: app_module.find_next_slot(dates[i % len(dates)]), range(min(len(plates), args.slot_calls)))
+    _time("get_appointment (exact)", app_module.get_appointment, plates)
+    _time("get_appointment (one slip)", app_module.get_appointment,
+          [p[:-1] + ("0" if p[-1] != "0" else "1") for p in plates])
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test and micro-benchmarks for app.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("load", help="concurrent simulated callers through /start and /listen")
+    p.add_argument("--callers", type=int, default=200, help="booking callers (as many status callers follow)")
+    p.add_argument("--concurrency", type=int, default=20)
+    p.add_argument("--url", help="target a running server instead of importing app.py")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser("compare", help="same load against gunicorn (sync) and uvicorn (asgi.py)")
+    p.add_argument("--callers", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=200)
+    p.add_argument("--tts-ms", type=float, default=300, help="simulated TTS time per reply line")
+    p.add_argument("--sync-threads", type=int, default=1, help="gunicorn threads (1 = render.yaml default)")
+    p.add_argument("--startup-timeout", type=float, default=180)
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("micro", help="time find_next_slot, normalize_vehicle_no and the DB helpers")
+    p.add_argument("-n", type=int, default=500)
+    p.add_argument("--slot-calls", type=int, default=200, help="find_next_slot calls")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(func=cmd_micro)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+# metrics.py - Per-stage latency spans, histograms and Prometheus text output
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; tuned for a voice turn (sub-ms regex work up to multi-second TTS)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms keyed by (metric name, sorted label pairs)."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.help = {}
+        self.lock = threading.Lock()
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self.lock:
+            items = sorted(self.histograms.items())
+            seen = set()
+            for (name, labels), hist in items:
+                if name not in seen:
+                    seen.add(name)
+                    if name in self.help:
+                        lines.append(f"# HELP {name} {self.help[name]}")
+                    lines.append(f"# TYPE {name} histogram")
+                base = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                sep = "," if base else ""
+                cumulative = 0
+                bounds = [repr(b) for b in hist.buckets] + ["+Inf"]
+                for bound, n in zip(bounds, hist.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+                braces = f"{{{base}}}" if base else ""
+                lines.append(f"{name}_sum{braces} {hist.total:.6f}")
+                lines.append(f"{name}_count{braces} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ==================== REQUEST TRACES ====================
+class Trace:
+    """Stage timings collected while one request is being handled."""
+
+    def __init__(self, route):
+        self.route = route
+        self.dialogue_stage = ""
+        self.started = time.perf_counter()
+        self.spans = []  # (stage, seconds), in order
+        self.turn = None  # conversation log entry, filled in by the dialogue route
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def breakdown(self):
+        totals = {}
+        for stage, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+
+registry = Registry()
+registry.describe("assistant_request_seconds", "Time to handle one HTTP request, by route and dialogue stage.")
+registry.describe("assistant_stage_seconds", "Time spent in each hot path (intent, slot search, SQLite, TTS).")
+
+# A context variable rather than a thread-local so spans recorded from
+# worker threads or coroutines still land in the request that started them.
+_trace = ContextVar("trace", default=None)
+
+
+def begin_trace(route):
+    trace = Trace(route)
+    _trace.set(trace)
+    return trace
+
+
+def end_trace():
+    trace = _trace.get()
+    _trace.set(None)
+    return trace
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def span(stage):
+    """Time a block; recorded in the stage histogram and the current trace."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        registry.observe("assistant_stage_seconds", seconds, stage=stage)
+        trace = _trace.get()
+        if trace is not None:
+            trace.spans.append((stage, seconds))
+
+
+def finish_request(trace, slow_ms=0):
+    """Record a finished trace; print the stage breakdown if it was slow."""
+    seconds = trace.elapsed()
+    registry.observe("assistant_request_seconds", seconds,
+                     route=trace.route, dialogue_stage=trace.dialogue_stage)
+    if slow_ms and seconds * 1000 >= slow_ms:
+        parts = ", ".join(f"{stage}={s * 1000:.1f}ms" for stage, s in trace.breakdown().items())
+        print(f"Slow request: {trace.route} [{trace.dialogue_stage or '-'}] "
+              f"{seconds * 1000:.1f}ms ({parts or 'no spans'})")
+    return seconds
+
+
+def timed(stage, fn):
+    """Wrap fn so every call is recorded as a span."""
+    def wrapper(*args, **kwargs):
+        with span(stage):
+            return fn(*args, **kwargs)
+    wrapper.__name__ = getattr(fn, "__name__", stage)
+    wrapper.__wrapped__ = fn
+    return wrapper
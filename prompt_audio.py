@@ -0,0 +1,200 @@
+# prompt_audio.py - Pre-rendered audio for the static parts of the dialogue prompts
+# Usage: python prompt_audio.py build [--out prompt_audio] [--tts gtts|stub]
+#
+# Every PROMPTS template is split at its {fields}: the literal pieces never
+# change, so they are synthesized once into a single bundle file plus a
+# manifest of byte ranges. The browser downloads the bundle once (it is
+# immutable and named by its hash) and plays those pieces itself; only the
+# dynamic values - names, dates, vehicle numbers - are synthesized per call.
+import argparse
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import wave
+from collections import OrderedDict
+from string import Formatter
+
+from dialogue import PROMPTS
+
+BUNDLE_VERSION = 1
+SAY_CACHE_SIZE = 512
+
+# ==================== SYNTHESIS ====================
+def synthesize_gtts(text):
+    from gtts import gTTS
+    buf = io.BytesIO()
+    gTTS(text=text, lang="en", tld="co.in", slow=False).write_to_fp(buf)
+    return buf.getvalue()
+
+
+def synthesize_stub(text):
+    """Offline stand-in: a short silent WAV (about 50 ms per character)."""
+    rate = 8000
+    frames = rate * max(1, len(text)) // 20
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(rate)
+        w.writeframes(struct.pack("B", 128) * frames)
+    return buf.getvalue()
+
+
+SYNTHESIZERS = {
+    "gtts": (synthesize_gtts, "audio/mpeg"),
+    "stub": (synthesize_stub, "audio/wav"),
+}
+
+# ==================== PROMPT SEGMENTS ====================
+def _speakable(text):
+    return any(ch.isalnum() for ch in text)
+
+
+def clip_id(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def template_parts(template):
+    """[(literal text, field name or None), ...] for one prompt template."""
+    return [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+
+
+def static_texts(prompts=PROMPTS):
+    """Every distinct literal piece of every prompt, in first-seen order."""
+    texts = OrderedDict()
+    for template in prompts.values():
+        for literal, _ in template_parts(template):
+            literal = literal.strip()
+            if _speakable(literal):
+                texts[literal] = None
+    return list(texts)
+
+
+def reply_segments(reply, prompts=PROMPTS):
+    """Audio plan for one reply: [{"clip": id}] for bundled pieces and
+    [{"say": text}] for values the server has to synthesize."""
+    key = getattr(reply, "key", None)
+    if key not in prompts:
+        return [{"say": str(reply)}]
+    segments = []
+    for literal, field in template_parts(prompts[key]):
+        literal = literal.strip()
+        if _speakable(literal):
+            segments.append({"clip": clip_id(literal)})
+        if field:
+            value = str(reply.fields.get(field, "")).strip()
+            if value:
+                segments.append({"say": value})
+    return segments
+
+# ==================== BUNDLE ====================
+class PromptBundle:
+    """Builds (or reloads) the clip bundle and synthesizes dynamic text.
+
+    Files in `out_dir`: manifest.json and bundle-<etag>.bin. The etag is a
+    hash of the clip texts and TTS backend, so editing a prompt yields a new
+    bundle name and old browser caches simply stop being referenced.
+    """
+
+    def __init__(self, out_dir, backend="gtts", prompts=PROMPTS):
+        self.out_dir = out_dir
+        self.backend = backend
+        self.synthesize, self.mimetype = SYNTHESIZERS[backend]
+        self.texts = static_texts(prompts)
+        digest = hashlib.sha1(json.dumps([BUNDLE_VERSION, backend, self.texts]).encode("utf-8"))
+        self.etag = digest.hexdigest()[:16]
+        self.manifest = None
+        self.data = None
+        self.say_cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.data is not None
+
+    def bundle_name(self):
+        return f"bundle-{self.etag}.bin"
+
+    def ensure(self):
+        """Load the bundle from disk if it matches the prompts, else build it."""
+        try:
+            if not self._load():
+                self.build()
+            print(f"Prompt audio bundle ready: {len(self.texts)} clips, "
+                  f"{len(self.data) / 1024:.0f} KB ({self.backend})")
+        except Exception as e:
+            print(f"Prompt audio bundle unavailable: {e}")
+
+    def _load(self):
+        manifest_path = os.path.join(self.out_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        bundle_path = os.path.join(self.out_dir, manifest.get("bundle", ""))
+        if manifest.get("etag") != self.etag or not os.path.exists(bundle_path):
+            return False
+        with open(bundle_path, "rb") as f:
+            self.data = f.read()
+        self.manifest = manifest
+        return True
+
+    def build(self):
+        clips = {}
+        chunks = []
+        offset = 0
+        for text in self.texts:
+            audio = self.synthesize(text)
+            clips[clip_id(text)] = {"offset": offset, "length": len(audio), "text": text}
+            chunks.append(audio)
+            offset += len(audio)
+        data = b"".join(chunks)
+        manifest = {
+            "version": BUNDLE_VERSION,
+            "etag": self.etag,
+            "bundle": self.bundle_name(),
+            "mimetype": self.mimetype,
+            "clips": clips,
+        }
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(os.path.join(self.out_dir, manifest["bundle"]), "wb") as f:
+            f.write(data)
+        with open(os.path.join(self.out_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=1)
+        self.manifest, self.data = manifest, data
+
+    def say(self, text):
+        """Synthesized audio for one dynamic value; recent values are cached."""
+        with self.lock:
+            audio = self.say_cache.get(text)
+            if audio is not None:
+                self.say_cache.move_to_end(text)
+                return audio
+        audio = self.synthesize(text)
+        with self.lock:
+            self.say_cache[text] = audio
+            if len(self.say_cache) > SAY_CACHE_SIZE:
+                self.say_cache.popitem(last=False)
+        return audio
+
+# ==================== CLI ====================
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render the static prompt audio bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="synthesize every static prompt piece")
+    p.add_argument("--out", default=os.environ.get("PROMPT_AUDIO_DIR", "prompt_audio"))
+    p.add_argument("--tts", choices=sorted(SYNTHESIZERS), default=os.environ.get("PROMPT_TTS", "gtts"))
+    args = parser.parse_args()
+
+    bundle = PromptBundle(args.out, args.tts)
+    bundle.build()
+    print(f"{len(bundle.texts)} clips, {len(bundle.data) / 1024:.0f} KB -> "
+          f"{os.path.join(args.out, bundle.bundle_name())}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
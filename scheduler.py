@@ -0,0 +1,297 @@
+# scheduler.py - Capacity-aware booking scheduler: bays, service durations, business hours
+#
+# Each day is cut into GRID_MINUTES cells. Per bay the day is one integer bit
+# mask of busy cells, so "where does a 2 hour job fit" is a handful of shifts
+# and ANDs rather than a scan over booked rows. Bays with the same mask are
+# grouped, so a day with hundreds of bays is searched once per distinct mask.
+# Full days are skipped with path-compressed "next day worth trying" pointers.
+import os
+from collections import namedtuple
+from datetime import timedelta
+
+Bay = namedtuple("Bay", ["name", "services"])
+Placement = namedtuple("Placement", ["date", "time", "bay"])
+
+# One bay doing 3 hour services 10:00-19:00 gives the old 10:00 / 13:00 / 16:00 slots
+DEFAULT_BAYS = (Bay("Bay 1", ("service", "wash")),)
+DEFAULT_DURATIONS = {"service": 180, "wash": 30}
+DEFAULT_HOURS = ("10:00", "19:00")
+GRID_MINUTES = 30
+
+
+def parse_bays(spec):
+    """"Bay 1:service,wash;Wash 1:wash" -> (Bay, ...)"""
+    bays = []
+    for part in spec.split(";"):
+        name, _, services = part.partition(":")
+        if name.strip():
+            bays.append(Bay(name.strip(), tuple(s.strip() for s in services.split(",") if s.strip())))
+    return tuple(bays)
+
+
+def parse_durations(spec):
+    """"service=120,wash=30" -> {"service": 120, "wash": 30}"""
+    durations = {}
+    for part in spec.split(","):
+        name, _, minutes = part.partition("=")
+        if name.strip():
+            durations[name.strip()] = int(minutes)
+    return durations
+
+
+def _minutes(hhmm):
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def _lowest_bit(x):
+    return (x & -x).bit_length() - 1
+
+
+class _Day:
+    """Busy mask per bay, and per service the bays grouped by mask."""
+
+    __slots__ = ("masks", "groups")
+
+    def __init__(self, bay_count, by_service):
+        self.masks = [0] * bay_count
+        self.groups = {service: {0: set(bays)} for service, bays in by_service.items()}
+
+
+class Scheduler:
+    """Earliest feasible placement across bays, honouring a preferred time.
+
+    load_day(date) -> [(time "HH:MM", bay name or None, service)] fills a day
+    the first time it is looked at; without it days start empty and callers
+    occupy() existing bookings themselves. The cache is per process, so
+    bookings made elsewhere need clear() (or forget(day)) before they are seen.
+    """
+
+    def __init__(self, bays=DEFAULT_BAYS, durations=DEFAULT_DURATIONS, hours=DEFAULT_HOURS,
+                 grid_minutes=GRID_MINUTES, closed_weekdays=(), load_day=None):
+        self.bays = tuple(bays)
+        self.durations = dict(durations)
+        self.grid = grid_minutes
+        self.open = _minutes(hours[0])
+        self.cells = (_minutes(hours[1]) - self.open) // grid_minutes
+        self.closed_weekdays = set(closed_weekdays)
+        self.load_day = load_day
+        self.by_service = {}
+        for i, bay in enumerate(self.bays):
+            for service in bay.services:
+                self.by_service.setdefault(service, []).append(i)
+        self.bay_index = {bay.name: i for i, bay in enumerate(self.bays)}
+        self.clear()
+
+    def clear(self):
+        self.days = {}     # date -> _Day
+        self.skip = {}     # (service, full date) -> later date worth trying
+        self._runs = {}    # (busy mask, cells needed) -> possible start cells
+
+    def forget(self, day):
+        """Drop one cached day so the next look at it reloads it."""
+        self.days.pop(day, None)
+        # The reloaded day may have room a skip pointer jumped over
+        self.skip.clear()
+
+    # ---------- grid helpers ----------
+    def cell(self, hhmm):
+        return (_minutes(hhmm) - self.open) // self.grid
+
+    def time_of(self, cell):
+        m = self.open + cell * self.grid
+        return f"{m // 60:02d}:{m % 60:02d}"
+
+    def length(self, service):
+        return max(1, -(-self.durations[service] // self.grid))
+
+    def _span(self, cell, service):
+        """Busy-mask bits for `service` starting at `cell`, clipped to opening hours."""
+        k = self.length(service)
+        lo, hi = max(cell, 0), min(cell + k, self.cells)
+        return ((1 << (hi - lo)) - 1) << lo if hi > lo else 0
+
+    def _day(self, day):
+        state = self.days.get(day)
+        if state is None:
+            state = self.days[day] = _Day(len(self.bays), self.by_service)
+            if self.load_day is not None:
+                for t, bay, service in self.load_day(day):
+                    self._mark(state, t, bay, service)
+        return state
+
+    def _set_mask(self, state, i, mask):
+        old = state.masks[i]
+        if old == mask:
+            return
+        for service in self.bays[i].services:
+            groups = state.groups[service]
+            members = groups[old]
+            members.discard(i)
+            if not members:
+                del groups[old]
+            groups.setdefault(mask, set()).add(i)
+        state.masks[i] = mask
+
+    def _starts(self, busy, k):
+        """Bit i set when k free cells begin at cell i."""
+        starts = self._runs.get((busy, k))
+        if starts is None:
+            free = ~busy & ((1 << self.cells) - 1)
+            starts = free
+            for i in range(1, k):
+                starts &= free >> i
+            self._runs[(busy, k)] = starts
+        return starts
+
+    # ---------- placement ----------
+    def _place_on(self, day, service, pref_cell, not_before):
+        if day.weekday() in self.closed_weekdays:
+            return None
+        groups = self._day(day).groups.get(service, {})
+        k = self.length(service)
+        union = 0
+        starts = []
+        for mask, members in groups.items():
+            s = self._starts(mask, k) >> not_before << not_before
+            if s:
+                starts.append((s, members))
+                union |= s
+        if not union:
+            return None
+        if pref_cell is None:
+            cell = _lowest_bit(union)
+        else:
+            after = union >> pref_cell << pref_cell
+            before = union & ((1 << pref_cell) - 1)
+            cell = _lowest_bit(after) if after else None
+            if before:
+                b = before.bit_length() - 1
+                if cell is None or pref_cell - b < cell - pref_cell:
+                    cell = b
+        bay = min(min(members) for s, members in starts if s >> cell & 1)
+        return Placement(day, self.time_of(cell), self.bays[bay].name)
+
+    def find(self, day, service="service", pref_time=None, now=None):
+        """Closest placement to pref_time on the first day (>= `day`) with room.
+
+        Nothing is reserved; call occupy() with the result. `now` stops
+        same-day placements in the past.
+        """
+        if not self.by_service.get(service) or self.length(service) > self.cells:
+            return None
+        pref_cell = None
+        if pref_time:
+            # Before opening means "as early as possible", after closing "as late as possible"
+            pref_cell = min(max(self.cell(pref_time), 0), self.cells)
+        path = []
+        while True:
+            nxt = self.skip.get((service, day))
+            if nxt is not None:
+                path.append(day)
+                day = nxt
+                continue
+            not_before = 0
+            if now is not None and day == now.date():
+                not_before = max(0, -(-(now.hour * 60 + now.minute - self.open) // self.grid))
+            placement = self._place_on(day, service, pref_cell, not_before)
+            if placement is not None:
+                break
+            if not_before == 0:
+                path.append(day)
+            day += timedelta(days=1)
+        for p in path:
+            self.skip[(service, p)] = day
+        return placement
+
+    def bay_at(self, day, hhmm, service="service"):
+        """First bay that can take `service` starting exactly at hhmm, or None."""
+        cell = self.cell(hhmm)
+        if cell < 0 or cell + self.length(service) > self.cells:
+            return None
+        span = self._span(cell, service)
+        free = [min(members) for mask, members in self._day(day).groups.get(service, {}).items()
+                if not mask & span]
+        return self.bays[min(free)].name if free else None
+
+    # ---------- bookkeeping ----------
+    def _mark(self, state, hhmm, bay, service):
+        if service not in self.durations:
+            service = "service"
+        span = self._span(self.cell(hhmm), service)
+        i = self.bay_index.get(bay)
+        if i is None:
+            # Rows from before bays existed: first bay with room, else the first bay
+            candidates = self.by_service.get(service) or range(len(self.bays))
+            i = next((j for j in candidates if not state.masks[j] & span), candidates[0])
+        self._set_mask(state, i, state.masks[i] | span)
+        return self.bays[i].name
+
+    def occupy(self, day, hhmm, bay=None, service="service"):
+        """Mark a booking as taken; returns the bay it was put in."""
+        return self._mark(self._day(day), hhmm, bay, service)
+
+    def release(self, day, hhmm, bay, service="service"):
+        state = self._day(day)
+        if service not in self.durations:
+            service = "service"
+        span = self._span(self.cell(hhmm), service)
+        i = self.bay_index.get(bay)
+        if i is None:
+            # Rows from before bays existed: whichever bay holds that job
+            i = next((j for j in self.by_service.get(service, ()) if state.masks[j] & span == span), None)
+        if i is not None:
+            self._set_mask(state, i, state.masks[i] & ~span)
+        # A freed cell can invalidate any pointer that jumped over it
+        self.skip.clear()
+
+    def overlaps(self, bookings):
+        """(date, bay, time) of every booking that starts inside an earlier
+        job in the same bay; bookings are (date, time, bay, service) rows."""
+        by_bay = {}
+        for d, t, bay, service in bookings:
+            start = _minutes(t)
+            end = start + self.durations.get(service, self.durations["service"])
+            by_bay.setdefault((d, bay), []).append((start, end, t))
+        clashes = []
+        for (d, bay), jobs in by_bay.items():
+            jobs.sort()
+            busy_until = None
+            for start, end, t in jobs:
+                if busy_until is not None and start < busy_until:
+                    clashes.append((d, bay, t))
+                busy_until = max(end, busy_until or end)
+        return clashes
+
+    def bookings_per_day(self, service="service"):
+        """Upper bound on `service` jobs per day with every bay free."""
+        per_bay = self.cells // self.length(service)
+        return per_bay * len(self.by_service.get(service, ()))
+
+
+def scheduler_from_env(load_day=None):
+    """Scheduler configured from SERVICE_BAYS, SERVICE_DURATIONS, BUSINESS_HOURS
+    and CLOSED_WEEKDAYS (0 = Monday), falling back to the single-bay defaults."""
+    bays = os.environ.get("SERVICE_BAYS")
+    durations = dict(DEFAULT_DURATIONS)
+    durations.update(parse_durations(os.environ.get("SERVICE_DURATIONS", "")))
+    hours = os.environ.get("BUSINESS_HOURS")
+    closed = os.environ.get("CLOSED_WEEKDAYS", "")
+    scheduler = Scheduler(
+        bays=parse_bays(bays) if bays else DEFAULT_BAYS,
+        durations=durations,
+        hours=tuple(hours.split("-")) if hours else DEFAULT_HOURS,
+        closed_weekdays=[int(d) for d in closed.split(",") if d.strip()],
+        load_day=load_day,
+    )
+    # Caught here rather than as a failed (or endless) slot search mid-call
+    if set(range(7)) <= scheduler.closed_weekdays:
+        raise ValueError("CLOSED_WEEKDAYS closes every day of the week")
+    if "service" not in scheduler.by_service:
+        raise ValueError("SERVICE_BAYS needs at least one bay offering 'service'")
+    for service in scheduler.by_service:
+        if service not in scheduler.durations:
+            raise ValueError(f"SERVICE_DURATIONS has no length for {service!r}")
+        if scheduler.length(service) > scheduler.cells:
+            raise ValueError(f"{service!r} doesn't fit inside BUSINESS_HOURS")
+    return scheduler
@@ -0,0 +1,173 @@
+# spoken_dates.py - Fast parsing of spoken dates and times
+# The common answers ("tomorrow", "20 november", "next monday", "4 pm") are handled
+# with compiled regexes and lookup tables; anything else falls back to dateparser.
+import re
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+
+# ==================== LOOKUP TABLES ====================
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thurs": 3, "friday": 4, "fri": 4, "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4,
+    "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10, "november": 11,
+    "nov": 11, "december": 12, "dec": 12,
+}
+RELATIVE_DAYS = {
+    "today": 0, "now": 0, "tonight": 0, "tomorrow": 1, "tommorow": 1, "tomorow": 1,
+    "day after tomorrow": 2, "the day after tomorrow": 2,
+    "next week": 7, "a week": 7, "one week": 7,
+}
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+NAMED_TIMES = {"noon": "12:00", "midday": "12:00", "midnight": "00:00",
+               "morning": "10:00", "afternoon": "14:00", "evening": "17:00"}
+# Nobody books a car service at 4 in the morning: "4", "two", "5 o'clock" mean PM
+BARE_PM_HOURS = range(1, 8)
+
+
+def _alts(words):
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+# ==================== COMPILED PATTERNS ====================
+_FILLER_RE = re.compile(r"\b(?:on|at|the|for|please|by|of)\b|,")
+_DOTS_RE = re.compile(r"\.(?!\d)")
+_SPACES_RE = re.compile(r"\s+")
+_IN_DAYS_RE = re.compile(r"^(?:in|after) (\d+|%s) (day|days|week|weeks)$" % _alts(NUMBER_WORDS))
+_WEEKDAY_RE = re.compile(r"^(?:(next|this|coming) )?(%s)$" % _alts(WEEKDAYS))
+_DAY_MONTH_RE = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)? (%s)(?: (\d{4}))?$" % _alts(MONTHS))
+_MONTH_DAY_RE = re.compile(r"^(%s) (\d{1,2})(?:st|nd|rd|th)?(?: (\d{4}))?$" % _alts(MONTHS))
+_ISO_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+_DMY_RE = re.compile(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})$")
+_TIME_RE = re.compile(
+    r"^(\d{1,2}|%s)(?:[:. ](\d{2}))? ?(?:(am|pm)|o'? ?clock)?$" % _alts(NUMBER_WORDS)
+)
+
+
+def _clean(text):
+    text = _FILLER_RE.sub(" ", _DOTS_RE.sub("", text.lower()))
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def _safe_date(year, month, day):
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _future_day_month(day, month, year, today):
+    """Day-month without a year means the next time that date comes round."""
+    if year:
+        return _safe_date(int(year), month, day)
+    found = _safe_date(today.year, month, day)
+    if found and found < today:
+        found = _safe_date(today.year + 1, month, day)
+    return found
+
+# ==================== FAST PATHS ====================
+def _fast_date(text, today):
+    if text in RELATIVE_DAYS:
+        return today + timedelta(days=RELATIVE_DAYS[text])
+
+    m = _WEEKDAY_RE.match(text)
+    if m:
+        ahead = (WEEKDAYS[m.group(2)] - today.weekday()) % 7
+        if ahead == 0 and m.group(1) == "next":
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    m = _DAY_MONTH_RE.match(text)
+    if m:
+        return _future_day_month(int(m.group(1)), MONTHS[m.group(2)], m.group(3), today)
+    m = _MONTH_DAY_RE.match(text)
+    if m:
+        return _future_day_month(int(m.group(2)), MONTHS[m.group(1)], m.group(3), today)
+
+    m = _IN_DAYS_RE.match(text)
+    if m:
+        n = NUMBER_WORDS.get(m.group(1)) or int(m.group(1))
+        return today + timedelta(days=n * 7 if m.group(2).startswith("week") else n)
+
+    m = _ISO_RE.match(text)
+    if m:
+        return _safe_date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+    m = _DMY_RE.match(text)
+    if m:
+        year = int(m.group(3))
+        return _safe_date(year + 2000 if year < 100 else year, int(m.group(2)), int(m.group(1)))
+    return None
+
+
+def _fast_time(text):
+    if text in NAMED_TIMES:
+        return NAMED_TIMES[text]
+    m = _TIME_RE.match(text)
+    if not m:
+        return None
+    hour = NUMBER_WORDS.get(m.group(1)) or int(m.group(1))
+    minute = int(m.group(2) or 0)
+    meridiem = m.group(3)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    elif hour in BARE_PM_HOURS and not m.group(1).startswith("0"):
+        hour += 12
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+# ==================== DATEPARSER FALLBACK ====================
+_dateparser = None
+
+
+def _fallback_parse(text, settings):
+    global _dateparser
+    if _dateparser is None:
+        import dateparser
+        _dateparser = dateparser
+    return _dateparser.parse(text, languages=["en"], settings=settings)
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_cached(text, today):
+    cleaned = _clean(text)
+    found = _fast_date(cleaned, today)
+    if found is not None:
+        return found
+    parsed = _fallback_parse(text, {
+        "PREFER_DATES_FROM": "future",
+        "RELATIVE_BASE": datetime.combine(today, dtime()),
+    })
+    return parsed.date() if parsed else None
+
+
+@lru_cache(maxsize=1024)
+def _parse_time_cached(text):
+    found = _fast_time(_clean(text))
+    if found is not None:
+        return found
+    parsed = _fallback_parse(text, {"PREFER_DAY_OF_MONTH": "current"})
+    return parsed.strftime("%H:%M") if parsed else None
+
+# ==================== PUBLIC API ====================
+def parse_date(text, today=None):
+    """Spoken date -> datetime.date (future preferred), or None."""
+    if not text:
+        return None
+    return _parse_date_cached(text.strip().lower(), today or date.today())
+
+
+def parse_time(text):
+    """Spoken time -> "HH:MM" (24h), or None."""
+    if not text:
+        return None
+    return _parse_time_cached(text.strip().lower())
@@ -1 +1,177 @@
+// script.js - Browser side of the voice assistant
+//
+// Replies are played here rather than on the server: the fixed parts of every
+// prompt come from a pre-rendered audio bundle (downloaded once, cached by the
+// browser), and only names, dates and vehicle numbers are fetched from
+// /audio/say. If the bundle isn't available the server speaks as before.
 
+const sessionId = (crypto.randomUUID && crypto.randomUUID()) || String(Date.now() + Math.random());
+const log = document.getElementById("conversation-log");
+const orb = document.getElementById("orb");
+const statusText = document.getElementById("status-text");
+
+// ==================== PROMPT AUDIO ====================
+const audio = {
+    context: null,
+    manifest: null,
+    bundle: null,          // ArrayBuffer with every clip back to back
+    decoded: new Map(),    // clip id -> AudioBuffer
+};
+
+async function loadPromptAudio() {
+    try {
+        const res = await fetch("/audio/manifest.json");
+        if (!res.ok) return false;
+        const manifest = await res.json();
+        const bundle = await fetch("/audio/" + manifest.bundle);
+        if (!bundle.ok) return false;
+        audio.bundle = await bundle.arrayBuffer();
+        audio.manifest = manifest;
+        return true;
+    } catch (e) {
+        console.warn("Prompt audio unavailable, using server speech", e);
+        return false;
+    }
+}
+
+function audioContext() {
+    if (!audio.context) {
+        audio.context = new (window.AudioContext || window.webkitAudioContext)();
+    }
+    return audio.context;
+}
+
+async function decodeClip(id) {
+    if (!audio.decoded.has(id)) {
+        const clip = audio.manifest.clips[id];
+        const bytes = audio.bundle.slice(clip.offset, clip.offset + clip.length);
+        audio.decoded.set(id, await audioContext().decodeAudioData(bytes));
+    }
+    return audio.decoded.get(id);
+}
+
+// The server signs every text it hands out; only those are synthesized
+async function decodeSay(segment) {
+    const res = await fetch("/audio/say?text=" + encodeURIComponent(segment.say) +
+                            "&sig=" + encodeURIComponent(segment.sig));
+    if (!res.ok) throw new Error("say failed: " + res.status);
+    return audioContext().decodeAudioData(await res.arrayBuffer());
+}
+
+function playBuffer(buffer) {
+    return new Promise((resolve) => {
+        const source = audioContext().createBufferSource();
+        source.buffer = buffer;
+        source.connect(audioContext().destination);
+        source.onended = resolve;
+        source.start();
+    });
+}
+
+// Fetch/decode every segment of a reply up front, then play them in order
+async function playReplies(segmentsPerReply) {
+    const segments = segmentsPerReply.flat();
+    const buffers = segments.map((s) => (s.clip ? decodeClip(s.clip) : decodeSay(s)));
+    for (const pending of buffers) {
+        try {
+            await playBuffer(await pending);
+        } catch (e) {
+            console.warn("Skipping audio segment", e);
+        }
+    }
+}
+
+// ==================== CONVERSATION ====================
+function addMessage(text, who) {
+    const div = document.createElement("div");
+    div.className = "message " + (who === "user" ? "user-message" : "assistant-message");
+    div.textContent = text;
+    log.appendChild(div);
+    log.scrollTop = log.scrollHeight;
+}
+
+function setMic(enabled, status) {
+    orb.classList.toggle("disabled", !enabled);
+    orb.classList.remove("listening");
+    statusText.textContent = status;
+}
+
+// Nothing has started yet; the first tap (a user gesture, which browsers
+// require before playing audio) opens the conversation.
+let finished = true;
+
+async function send(path, body) {
+    setMic(false, "Assistant is speaking...");
+    let status = "Tap the mic and speak";
+    try {
+        const res = await fetch(path, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(Object.assign({ session_id: sessionId, client_audio: !!audio.manifest }, body)),
+        });
+        const data = await res.json();
+        if (!res.ok || !Array.isArray(data.replies)) throw new Error(data.error || "HTTP " + res.status);
+        data.replies.forEach((line) => addMessage(line, "assistant"));
+        if (data.audio) {
+            await playReplies(data.audio);
+        }
+        finished = data.done;
+        if (finished) status = "Tap the mic to start again";
+    } catch (e) {
+        console.warn("Request failed", e);
+        addMessage("Sorry, something went wrong. Please try again.", "assistant");
+        // A failed /start never opened a conversation; the next tap retries it
+        if (path === "/start") finished = true;
+        status = finished ? "Tap the mic to try again" : "Tap the mic and say that again";
+    } finally {
+        // Whatever happened, the orb must not stay disabled
+        setMic(true, status);
+    }
+}
+
+function startConversation() {
+    finished = false;
+    return send("/start", {});
+}
+
+// ==================== SPEECH RECOGNITION ====================
+const Recognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+
+function listenOnce() {
+    if (finished) {
+        audioContext();
+        startConversation();
+        return;
+    }
+    if (!Recognition) {
+        const typed = prompt("Speech recognition isn't supported here. Type your answer:");
+        if (typed) answer(typed);
+        return;
+    }
+    const recognition = new Recognition();
+    recognition.lang = "en-IN";
+    recognition.interimResults = false;
+    recognition.maxAlternatives = 1;
+    orb.classList.add("listening");
+    statusText.textContent = "Listening...";
+    recognition.onresult = (event) => answer(event.results[0][0].transcript);
+    recognition.onerror = () => setMic(true, "Didn't catch that. Tap the mic and try again");
+    recognition.onend = () => orb.classList.remove("listening");
+    recognition.start();
+}
+
+function answer(text) {
+    addMessage(text, "user");
+    send("/listen", { message: text });
+}
+
+orb.addEventListener("click", () => {
+    // Browsers only allow audio after a user gesture
+    if (audio.context && audio.context.state === "suspended") audio.context.resume();
+    listenOnce();
+});
+
+window.addEventListener("load", async () => {
+    await loadPromptAudio();
+    setMic(true, "Tap the mic to talk to the assistant");
+});
@@ -0,0 +1,138 @@
+# vehicle_index.py - In-memory fuzzy index over booked vehicle numbers
+# Speech recognition confuses O/0, B/8, I/1, S/5... and drops characters, so an
+# exact WHERE vehicle_no=? often misses. Plates are indexed by a "skeleton" that
+# folds those look/sound-alikes together, plus every variant of the skeleton
+# with up to `max_distance` characters deleted (symmetric deletion index). Two
+# plates within that edit distance always share at least one variant, so a
+# search is a handful of dict lookups followed by a small weighted re-rank.
+import threading
+
+# Characters the recognizer swaps for each other; a swap inside a group costs
+# CONFUSION_COST instead of a full edit when ranking candidates.
+CONFUSABLE = {"O": "0", "Q": "0", "I": "1", "L": "1", "Z": "2", "S": "5", "G": "6", "B": "8"}
+CONFUSION_COST = 0.25
+
+_SKELETON = str.maketrans(CONFUSABLE)
+
+
+def skeleton(vehicle):
+    return vehicle.upper().translate(_SKELETON)
+
+
+def deletion_variants(text, max_distance):
+    variants = {text}
+    level = {text}
+    for _ in range(max_distance):
+        level = {w[:i] + w[i + 1:] for w in level if len(w) > 1 for i in range(len(w))}
+        variants |= level
+    return variants
+
+
+def weighted_distance(a, b):
+    """Levenshtein distance where confusable substitutions cost CONFUSION_COST."""
+    if len(a) < len(b):
+        a, b = b, a
+    sb = b.translate(_SKELETON)
+    prev = list(range(len(b) + 1))
+    for i, (ca, sa) in enumerate(zip(a, a.translate(_SKELETON)), 1):
+        cur = [i]
+        for j in range(1, len(b) + 1):
+            if ca == b[j - 1]:
+                sub = prev[j - 1]
+            elif sa == sb[j - 1]:
+                sub = prev[j - 1] + CONFUSION_COST
+            else:
+                sub = prev[j - 1] + 1
+            ins = cur[j - 1] + 1
+            dele = prev[j] + 1
+            cur.append(sub if sub <= ins and sub <= dele else min(ins, dele))
+        prev = cur
+    return prev[-1]
+
+
+class VehicleIndex:
+    """Bounded edit-distance lookup over a set of vehicle numbers.
+
+    Values in the variant map are a plate string, or a set once two plates
+    share a variant, which keeps memory down for the common unique case.
+    """
+
+    def __init__(self, vehicles=(), max_distance=1):
+        self.max_distance = max_distance
+        self.plates = set()
+        self.variants = {}
+        self.lock = threading.Lock()
+        for vehicle in vehicles:
+            self._add(vehicle.upper())
+
+    def __len__(self):
+        return len(self.plates)
+
+    def __contains__(self, vehicle):
+        return vehicle.upper() in self.plates
+
+    def add(self, vehicle):
+        with self.lock:
+            self._add(vehicle.upper())
+
+    def remove(self, vehicle):
+        vehicle = vehicle.upper()
+        with self.lock:
+            if vehicle not in self.plates:
+                return
+            self.plates.discard(vehicle)
+            for v in deletion_variants(skeleton(vehicle), self.max_distance):
+                entry = self.variants.get(v)
+                if entry == vehicle:
+                    del self.variants[v]
+                elif isinstance(entry, set):
+                    entry.discard(vehicle)
+                    if len(entry) == 1:
+                        self.variants[v] = entry.pop()
+
+    def _add(self, vehicle):
+        if vehicle in self.plates:
+            return
+        self.plates.add(vehicle)
+        for v in deletion_variants(skeleton(vehicle), self.max_distance):
+            entry = self.variants.get(v)
+            if entry is None:
+                self.variants[v] = vehicle
+            elif isinstance(entry, set):
+                entry.add(vehicle)
+            else:
+                self.variants[v] = {entry, vehicle}
+
+    def search(self, vehicle, limit=3):
+        """Return up to `limit` (plate, distance) pairs, closest first."""
+        vehicle = vehicle.upper()
+        if not vehicle:
+            return []
+        with self.lock:
+            if vehicle in self.plates:
+                return [(vehicle, 0.0)]
+            candidates = set()
+            for v in deletion_variants(skeleton(vehicle), self.max_distance):
+                entry = self.variants.get(v)
+                if entry is None:
+                    continue
+                if isinstance(entry, set):
+                    candidates |= entry
+                else:
+                    candidates.add(entry)
+        scored = []
+        for plate in candidates:
+            d = weighted_distance(vehicle, plate)
+            if d <= self.max_distance:
+                scored.append((plate, d))
+        scored.sort(key=lambda pair: (pair[1], pair[0]))
+        return scored[:limit]
+
+    def best(self, vehicle):
+        """Single closest plate, or None when nothing is close or the top two tie."""
+        found = self.search(vehicle, limit=2)
+        if not found:
+            return None
+        if len(found) == 2 and found[0][1] == found[1][1]:
+            return None
+        return found[0][0]
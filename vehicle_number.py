@@ -0,0 +1,83 @@
+# vehicle_number.py - Spoken vehicle number -> registration plate (PB10AB1234)
+# One pass over the tokens of the transcript: digit words, "double"/"triple",
+# NATO and spelled-out letter names are mapped through a single lookup table.
+import re
+
+# ==================== TABLES ====================
+DIGIT_WORDS = {
+    "zero": "0", "oh": "0", "nil": "0", "one": "1", "two": "2", "to": "2", "too": "2",
+    "three": "3", "four": "4", "for": "4", "five": "5", "six": "6", "seven": "7",
+    "eight": "8", "nine": "9",
+}
+TEEN_WORDS = {
+    "ten": "10", "eleven": "11", "twelve": "12", "thirteen": "13", "fourteen": "14",
+    "fifteen": "15", "sixteen": "16", "seventeen": "17", "eighteen": "18", "nineteen": "19",
+}
+TENS_WORDS = {
+    "twenty": "20", "thirty": "30", "forty": "40", "fifty": "50",
+    "sixty": "60", "seventy": "70", "eighty": "80", "ninety": "90",
+}
+NATO_WORDS = {
+    "alpha": "A", "alfa": "A", "bravo": "B", "charlie": "C", "delta": "D", "echo": "E",
+    "foxtrot": "F", "golf": "G", "hotel": "H", "india": "I", "juliet": "J", "juliett": "J",
+    "kilo": "K", "lima": "L", "mike": "M", "november": "N", "oscar": "O", "papa": "P",
+    "quebec": "Q", "romeo": "R", "sierra": "S", "tango": "T", "uniform": "U",
+    "victor": "V", "whiskey": "W", "whisky": "W", "xray": "X", "yankee": "Y", "zulu": "Z",
+}
+LETTER_NAMES = {
+    "bee": "B", "cee": "C", "see": "C", "dee": "D", "ee": "E", "eff": "F", "gee": "G",
+    "aitch": "H", "etch": "H", "jay": "J", "kay": "K", "el": "L", "em": "M", "en": "N",
+    "pee": "P", "cue": "Q", "queue": "Q", "ar": "R", "ess": "S", "tee": "T",
+    "vee": "V", "ex": "X", "why": "Y", "zed": "Z", "zee": "Z",
+}
+MULTIPLIERS = {"double": 2, "triple": 3}
+FILLERS = {
+    "my", "number", "no", "is", "its", "it's", "it", "vehicle", "car", "the", "registration",
+    "plate", "and", "dash", "hyphen", "space", "please", "sorry", "um", "uh", "that",
+}
+
+SPOKEN = {**NATO_WORDS, **LETTER_NAMES, **TEEN_WORDS, **TENS_WORDS, **DIGIT_WORDS}
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|\d+")
+
+# Standard series (PB10AB1234, DL3CAF0001) and Bharat series (22BH1234AA).
+PLATE_RE = re.compile(r"^(?:[A-Z]{2}\d{1,2}[A-Z]{0,3}\d{4}|\d{2}BH\d{4}[A-Z]{1,2})$")
+# State code followed only by digits, as callers often skip the RTO series (PB989898).
+SHORT_PLATE_RE = re.compile(r"^[A-Z]{2}\d{4,8}$")
+
+# ==================== NORMALIZER ====================
+def normalize_vehicle_no(text):
+    """Convert any spoken vehicle number to clean format: PB10AB1234"""
+    out = []
+    repeat = 1
+    after_tens = False
+    for m in _TOKEN_RE.finditer(text.lower()):
+        tok = m.group()
+        if tok in MULTIPLIERS:
+            repeat = MULTIPLIERS[tok]
+            continue
+        if tok in FILLERS:
+            continue
+        if repeat == 2 and tok in ("u", "you"):
+            chars, repeat = "W", 1
+        else:
+            chars = SPOKEN.get(tok) or tok.upper()
+        # "twenty three" -> 23 rather than 203
+        if after_tens and tok in DIGIT_WORDS and chars != "0":
+            out[-1] = out[-1][:-1] + chars
+            after_tens = False
+            continue
+        out.append(chars * repeat)
+        repeat = 1
+        after_tens = tok in TENS_WORDS
+    return "".join(out)
+
+
+def is_valid_plate(vehicle):
+    """Strict Indian registration plate check."""
+    return bool(PLATE_RE.match(vehicle))
+
+
+def is_plausible_plate(vehicle):
+    """Accept strict plates and the short state+digits form already in the DB."""
+    return bool(PLATE_RE.match(vehicle) or SHORT_PLATE_RE.match(vehicle))
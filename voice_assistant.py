@@ -1,25 +1,26 @@
-import sounddevice as sd
-import wavio
-import whisper
-import pyttsx3
 import sqlite3
 from datetime import datetime, timedelta
-import dateparser
 import re
 import time
 import os
+import threading
+from dialogue import Session, DialogueEngine
+from spoken_dates import parse_date, parse_time
+from vehicle_number import normalize_vehicle_no, is_plausible_plate
 
 # ------------------- SETTINGS -------------------
 FILENAME = "recorded.wav"
 FS = 44100
 DURATION = 6
 DB_FILE = "appointments.db"
+WHISPER_MODEL = "medium"  # or "base" for faster speed
 
 # ------------------- FIX 1: Robust TTS Engine -------------------
 # We rebuild the engine before EVERY speech to avoid the Windows freeze bug
 def speak(text):
     print(f"Assistant: {text}")
     try:
+        import pyttsx3
         # Create a fresh engine instance every time (fixes Windows silence bug)
         engine = pyttsx3.init()
         engine.setProperty('rate', 160)
@@ -40,9 +41,20 @@ def speak(text):
         print(f"TTS Error: {e}")
 
 # ------------------- REST OF YOUR ORIGINAL CODE (with fixes) -------------------
-print("Loading Whisper model...")
-model = whisper.load_model("medium")  # or "base" for faster speed
-print("Model loaded!")
+# Whisper (and torch under it) takes seconds to import and load, so it happens
+# on first use; car_center_assistant() starts it while the greeting is spoken.
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            import whisper
+            print("Loading Whisper model...")
+            _model = whisper.load_model(WHISPER_MODEL)
+            print("Model loaded!")
+        return _model
 
 # ------------------- FIX 2: Recreate DB properly -------------------
 def init_db():
@@ -69,22 +81,25 @@ def init_db():
 
 # ------------------- Recording & Transcription -------------------
 def record_audio():
+    import sounddevice as sd
+    import wavio
     print("   Listening... (speak now)")
     data = sd.rec(int(DURATION * FS), samplerate=FS, channels=1, dtype='int16')
     sd.wait()
     wavio.write(FILENAME, data, FS, sampwidth=2)
 
-def listen_and_transcribe(prompt=None):
+def listen_and_transcribe(prompt=None, echo=True):
     if prompt:
         speak(prompt)
     
     for _ in range(3):
         record_audio()
         try:
-            result = model.transcribe(FILENAME, language="en")
+            result = get_model().transcribe(FILENAME, language="en")
             text = result["text"].strip()
             if text:
-                speak(f"You said: {text}")
+                if echo:
+                    speak(f"You said: {text}")
                 return text.lower()
             else:
                 speak("I didn't hear anything clearly. Please speak again.")
@@ -95,37 +110,13 @@ def listen_and_transcribe(prompt=None):
     speak("I couldn't understand after a few tries. Let's continue anyway.")
     return ""
 
-# ------------------- Confirmation Helper -------------------
-def get_confirmed_input(prompt):
-    while True:
-        text = listen_and_transcribe(prompt)
-        if not text:
-            continue
-        speak("Is this correct? Say yes or no.")
-        confirm = listen_and_transcribe()
-        if any(word in confirm for word in ["yes", "haan", "ji", "correct", "right"]):
-            speak("Okay, confirmed!")
-            return text
-        else:
-            speak("Alright, let's try again.")
-
 # ------------------- Time Normalization -------------------
 def normalize_time(t):
-    parsed = dateparser.parse(t, settings={'PREFER_DAY_OF_MONTH': 'current'})
-    return parsed.strftime("%H:%M") if parsed else None
-
-def get_confirmed_time(prompt):
-    while True:
-        raw = get_confirmed_input(prompt)
-        norm = normalize_time(raw)
-        if norm:
-            return norm
-        speak("I didn't understand the time. Please say like 10 AM, 2 PM, or 11 30.")
+    return parse_time(t)
 
 # ------------------- Slot Finder -------------------
-def find_next_available_slot(date_str, time_str):
-    base = dateparser.parse(date_str) or datetime.now()
-    check_date = base.date()
+def find_next_available_slot(date_str, time_str, service="service"):
+    check_date = parse_date(date_str) or datetime.now().date()
     
     for _ in range(30):
         date_key = check_date.strftime("%Y-%m-%d")
@@ -154,7 +145,6 @@ def add_appointment(username, vehicle_no, date, time):
         conn.commit()
         return True
     except sqlite3.IntegrityError:
-        speak("This vehicle already has an appointment.")
         return False
     finally:
         conn.close()
@@ -162,53 +152,57 @@ def add_appointment(username, vehicle_no, date, time):
 def get_appointment(vehicle_no):
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
-    c.execute("SELECT username, date, time FROM appointments WHERE vehicle_no=?", (vehicle_no.upper(),))
+    # This CLI only books general services
+    c.execute("SELECT username, date, time, vehicle_no, 'service' FROM appointments WHERE vehicle_no=?",
+              (vehicle_no.upper(),))
     result = c.fetchone()
     conn.close()
     return result
 
+def cancel_appointment(vehicle_no):
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("DELETE FROM appointments WHERE vehicle_no=?", (vehicle_no.upper(),))
+    cancelled = c.rowcount > 0
+    conn.commit()
+    conn.close()
+    return cancelled
+
+def reschedule_appointment(vehicle_no, date, time):
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+    c.execute("UPDATE appointments SET date=?, time=? WHERE vehicle_no=?", (date, time, vehicle_no.upper()))
+    moved = c.rowcount > 0
+    conn.commit()
+    conn.close()
+    return moved
+
 # ------------------- Main Assistant -------------------
+# Same stage table as the web app (dialogue.py); Whisper just replaces the browser mic.
+engine = DialogueEngine(
+    find_slot=find_next_available_slot,
+    book=add_appointment,
+    lookup=get_appointment,
+    cancel=cancel_appointment,
+    reschedule=reschedule_appointment,
+    normalize_vehicle=normalize_vehicle_no,
+    validate_vehicle=is_plausible_plate,
+)
+
 def car_center_assistant():
     init_db()  # This will fix the DB column issue
+    threading.Thread(target=get_model, daemon=True).start()
     
-    speak("Good morning! Welcome to Deewanshi Car Center.")
-    
-    user_name = get_confirmed_input("May I know your name please?")
-    
+    session = Session()
+    turn = engine.start(session)
     while True:
-        action = listen_and_transcribe(
-            "How can I help you today? Say 'book appointment' or 'car status'."
-        )
-        
-        if "book" in action or "appointment" in action:
-            vehicle_no = get_confirmed_input("Please tell me your vehicle number.")
-            pref_date = get_confirmed_input("What date would you like? For example, tomorrow or 20 November.")
-            pref_time = get_confirmed_time("What time would you prefer?")
-            
-            avail_date, avail_time = find_next_available_slot(pref_date, pref_time)
-            
-            if add_appointment(user_name, vehicle_no, avail_date, avail_time):
-                nice_date = datetime.strptime(avail_date, "%Y-%m-%d").strftime("%d %B %Y")
-                speak(f"Excellent! Your appointment is booked for {nice_date} at {avail_time}.")
-                speak(f"We will take good care of your car {vehicle_no.upper()}. Thank you!")
-        
-        elif "status" in action or "ready" in action or "car" in action:
-            vehicle_no = get_confirmed_input("Please say your vehicle number.")
-            appt = get_appointment(vehicle_no)
-            if appt:
-                name, date, time = appt
-                nice_date = datetime.strptime(date, "%Y-%m-%d").strftime("%d %B %Y")
-                speak(f"Your car will be ready on {nice_date} at {time}. Have a great day!")
-            else:
-                speak("Sorry, no appointment found for this vehicle.")
-        
-        else:
-            speak("Sorry, I didn't understand. Please say book appointment or car status.")
-        
-        again = listen_and_transcribe("Do you need any other help?")
-        if "no" in again or "thank" in again or "bye" in again:
-            speak(f"Thank you {user_name.title()}! Have a wonderful day!")
+        for line in turn.replies:
+            speak(line)
+        if turn.done:
             break
+        # The engine echoes and confirms every answer itself
+        text = listen_and_transcribe(echo=False)
+        turn = engine.step(session, text)
 
 # ------------------- RUN -------------------
 if __name__ == "__main__":
@@ -5,6 +5,7 @@ import csv
 import os
 import datetime
 import time
+from vehicle_number import normalize_vehicle_no
 
 # ---------- Config ----------
 WAKE_WORD = "hello"            # wake word you chose
@@ -92,7 +93,7 @@ def save_db(records):
 
 # small normalizations
 def normalize_vehicle(text):
-    return text.replace(" ", "").upper()
+    return normalize_vehicle_no(text)
 
 def greeting():
     hour = datetime.datetime.now().hour